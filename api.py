@@ -1,11 +1,283 @@
-import requests
 import json
-from requests_toolbelt import MultipartEncoder
+import threading
+import time
+
+from bulk import BulkJob
+from cassette import body_sha256
+from cleanup import Cleanup
+from keys import KeyManager
+from metrics import RequestEvent
+from models import Pet, PetList, loads
+from pets import PetIndex, iter_json_array
+from photos import open_photo
+from throttle import parse_retry_after
+
+# Статусы ответа, при которых клиент с ограничителями повторяет идемпотентные запросы.
+_RETRY_STATUSES = (429, 502, 503, 504)
 
 
 class PetFriends:
-    def __init__(self):
-        self.base_url = "https://petfriends.skillfactory.ru/"
+    def __init__(self, base_url: str = "https://petfriends.skillfactory.ru/",
+                 pool_connections: int = 10, pool_maxsize: int = 10,
+                 connect_timeout: float = 5, read_timeout: float = 30,
+                 retries: int = 3, backoff_factor: float = 0.3,
+                 key_cache_path: str = None, key_ttl: float = None, models: bool = False, metrics=None,
+                 cassette=None, cache=None, photo_processor=None, rate_limiter=None, concurrency_limiter=None):
+        """Клиент держит собственную сессию requests с пулом keep-alive соединений, поэтому
+        повторные запросы к base_url не открывают новое TCP+TLS соединение.
+        pool_connections - количество пулов (хостов), хранимых сессией, pool_maxsize - максимальное
+        количество соединений с одним хостом. Идемпотентные запросы (GET, PUT, DELETE) при ошибках
+        соединения и ответах 502/503/504 повторяются retries раз с экспоненциальной задержкой.
+        Ключи авторизации, полученные через get_key, кэшируются (см. KeyManager): в памяти и, если
+        задан key_cache_path, на диске с временем жизни key_ttl секунд. Если сервер отвечает 403 на
+        запрос с таким ключом, клиент получает новый ключ и один раз повторяет запрос.
+        Если models=True, методы возвращают вместо словарей объекты Pet и PetList (см. models.py).
+        metrics - приемник событий о запросах: функция, которая вызывается с RequestEvent после
+        каждого запроса (например, metrics.MetricsRecorder). Если он не задан, время не замеряется.
+        cassette - кассета (см. cassette.Cassette), в которую записываются запросы и ответы или из
+        которой они воспроизводятся без обращения к серверу.
+        cache - кэш списков питомцев (см. cache.ResponseCache), который используется get_list_of_pets
+        и очищается после успешных изменений питомцев через клиент.
+        photo_processor - подготовка фото перед загрузкой (см. imaging.PhotoProcessor): проверка формата,
+        уменьшение и перекодирование в JPEG.
+        rate_limiter (см. throttle.TokenBucket) ограничивает частоту запросов, а concurrency_limiter
+        (см. throttle.AdaptiveLimiter) - количество одновременных запросов, подстраивая его под
+        ответы сервера. Оба общие для всех потоков, использующих клиент, и учитывают Retry-After;
+        повторы запросов после 429 и 502/503/504 тоже проходят через них.
+        Текущие значения возвращает метод limits().
+        requests и requests_toolbelt импортируются, а сессия создается при первом запросе, поэтому
+        импорт модуля и создание клиента не загружают HTTP-стек."""
+
+        self.base_url = base_url
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = (connect_timeout, read_timeout)
+        self.keys = KeyManager(key_cache_path, key_ttl)
+        self.models = models
+        self.metrics = metrics
+        self.cassette = cassette
+        self.cache = cache
+        self.photo_processor = photo_processor
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self._write_listeners = []
+        if cache is not None:
+            self.add_write_listener(self._invalidate_cache)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Сессия requests клиента (см. transport.new_session), создается при первом обращении.
+        Если задан ограничитель, сессия не повторяет запросы по статусу ответа: это делает _send."""
+
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import transport
+                    limited = self.rate_limiter is not None or self.concurrency_limiter is not None
+                    self._session = transport.new_session(self.pool_connections, self.pool_maxsize,
+                                                          self.retries, self.backoff_factor, not limited)
+        return self._session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Метод закрывает сессию и все соединения из пула и записывает на диск буфер кассеты."""
+
+        if self._session is not None:
+            self._session.close()
+        if self.cassette is not None:
+            self.cassette.flush()
+
+    def _request(self, method: str, path: str, headers: dict = None, fields: dict = None, progress=None,
+                 endpoint: str = None, **kwargs):
+        """Метод отправляет запрос через сессию клиента с таймаутами по умолчанию. Если передан fields,
+        тело отправляется потоком в формате multipart/form-data (см. _multipart).
+        Если на запрос с ключом из self.keys сервер ответил 403, ключ обновляется и запрос
+        повторяется один раз. endpoint - название эндпоинта для метрик (по умолчанию path).
+        Если задана кассета, запрос с ответом записывается в нее или ответ берется из нее."""
+
+        kwargs.setdefault('timeout', self.timeout)
+        headers = dict(headers or {})
+        if self.cassette is not None:
+            body = body_sha256(fields if fields is not None else kwargs.get('data'))
+            match = self.cassette.match_key(method, path, kwargs.get('params'), headers, body)
+            if self.cassette.replaying:
+                return self.cassette.play(match, self.base_url + path)
+        if 'auth_key' in headers:
+            headers['auth_key'] = self.keys.current(headers['auth_key'])
+        # Позиции файлов запоминаются, чтобы при повторе отправить фото с начала.
+        files = [(value[1], value[1].tell()) for value in (fields or {}).values() if isinstance(value, tuple)]
+
+        for attempt in range(2):
+            if fields is not None:
+                for photo, position in files:
+                    photo.seek(position)
+                kwargs['data'] = self._multipart(fields, progress)
+                headers['Content-Type'] = kwargs['data'].content_type
+            res = self._send(method, path, endpoint or path, headers=headers, **kwargs)
+
+            stale_key = headers.get('auth_key')
+            if attempt or res.status_code != 403 or self.keys.credentials(stale_key) is None:
+                break
+            new_key = self.keys.refresh(stale_key, self.get_api_key)
+            if new_key is None:
+                break
+            headers['auth_key'] = new_key
+        if self.cassette is not None:
+            self.cassette.record(match, method, path, kwargs.get('params'), headers, body, res)
+        return res
+
+    def limits(self) -> dict:
+        """Метод возвращает текущие ограничения клиента: частоту запросов (rate), лимит одновременных
+        запросов (concurrency_limit), количество выполняемых (in_flight) и ожидающих (queue_depth) запросов."""
+
+        rate, concurrency = self.rate_limiter, self.concurrency_limiter
+        return {'rate': rate.rate if rate is not None else None,
+                'concurrency_limit': concurrency.limit if concurrency is not None else None,
+                'in_flight': concurrency.in_flight if concurrency is not None else None,
+                'queue_depth': (rate.waiting if rate is not None else 0) +
+                               (concurrency.queue_depth if concurrency is not None else 0)}
+
+    def _send(self, method: str, path: str, endpoint: str, **kwargs):
+        """Метод отправляет запрос, соблюдая ограничения self.rate_limiter и self.concurrency_limiter.
+        Сессия клиента с ограничителями не повторяет запросы по статусу ответа (см. session), поэтому
+        идемпотентные запросы при ответах 429 и 502/503/504 повторяются здесь, до retries раз: каждая
+        попытка проходит через ограничители, и они видят все ответы сервера, включая Retry-After."""
+
+        if self.rate_limiter is None and self.concurrency_limiter is None:
+            return self._send_measured(method, path, endpoint, **kwargs)
+
+        from transport import IDEMPOTENT_METHODS
+
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            res, retry_after = self._send_limited(method, path, endpoint, **kwargs)
+            if attempt == attempts - 1 or res.status_code not in _RETRY_STATUSES:
+                return res
+            res.close()
+            # С Retry-After следующую попытку задерживают ограничители, без него - экспоненциальная задержка.
+            if not retry_after:
+                time.sleep(self.backoff_factor * 2 ** attempt)
+
+    def _send_limited(self, method: str, path: str, endpoint: str, **kwargs):
+        """Метод отправляет запрос через ограничители, сообщает им о результате и возвращает
+        (ответ, задержка из Retry-After)."""
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.concurrency_limiter is None:
+            res = self._send_measured(method, path, endpoint, **kwargs)
+            retry_after = parse_retry_after(res.headers.get('Retry-After'))
+        else:
+            self.concurrency_limiter.acquire()
+            start = time.perf_counter()
+            res = retry_after = None
+            try:
+                res = self._send_measured(method, path, endpoint, **kwargs)
+                retry_after = parse_retry_after(res.headers.get('Retry-After'))
+            finally:
+                self.concurrency_limiter.release(res.status_code if res is not None else None,
+                                                 time.perf_counter() - start, retry_after)
+        if retry_after and self.rate_limiter is not None:
+            self.rate_limiter.pause(retry_after)
+        return res, retry_after
+
+    def _send_measured(self, method: str, path: str, endpoint: str, **kwargs):
+        """Метод отправляет запрос через сессию и, если задан приемник self.metrics, передает ему
+        RequestEvent с временем, размерами запроса и ответа, количеством повторов и текущими
+        ограничениями клиента (см. limits)."""
+
+        session = self.session
+        if self.metrics is None:
+            return session.request(method, self.base_url + path, **kwargs)
+
+        from requests import RequestException
+        from transport import pop_connect_timings
+
+        pop_connect_timings()
+        start = time.perf_counter()
+        try:
+            res = session.request(method, self.base_url + path, **kwargs)
+        except RequestException as e:
+            connect, tls = pop_connect_timings()
+            self._emit(RequestEvent(endpoint, method, connect=connect, tls=tls,
+                                    total=time.perf_counter() - start, error=repr(e)))
+            raise
+        total = time.perf_counter() - start
+        connect, tls = pop_connect_timings()
+
+        body = res.request.body
+        bytes_sent = 0 if body is None else getattr(body, 'len', None) or len(body)
+        if kwargs.get('stream'):
+            bytes_received = int(res.headers.get('Content-Length', 0))
+        else:
+            bytes_received = len(res.content)
+        retries = res.raw.retries
+        self._emit(RequestEvent(endpoint, method, res.status_code, bytes_sent, bytes_received, connect, tls,
+                                res.elapsed.total_seconds(), total,
+                                len(retries.history) if retries is not None else 0))
+        return res
+
+    def _emit(self, event: RequestEvent) -> None:
+        if self.rate_limiter is not None or self.concurrency_limiter is not None:
+            limits = self.limits()
+            event.limit = limits['concurrency_limit']
+            event.queue_depth = limits['queue_depth']
+        self.metrics(event)
+
+    def _result(self, res, model=None):
+        """Метод разбирает тело ответа как JSON (см. models.loads) и возвращает результат, а если тело
+        не является JSON - текст ответа. При включенном self.models успешный ответ преобразуется
+        в model (Pet или PetList)."""
+
+        try:
+            result = loads(res.content)
+        except ValueError:
+            return res.text
+        if self.models and model is not None and res.status_code == 200 and isinstance(result, dict):
+            return model.from_dict(result)
+        return result
+
+    def add_write_listener(self, callback):
+        """Метод подписывает callback(operation, get_key, pet_id, result) на успешные изменения питомцев:
+        operation - 'create', 'update', 'set_photo' или 'delete'."""
+
+        self._write_listeners.append(callback)
+
+    def remove_write_listener(self, callback):
+        self._write_listeners.remove(callback)
+
+    def _notify_write(self, operation: str, get_key: json, status: int, pet_id: str = None, result=None):
+        if status != 200:
+            return
+        if pet_id is None:
+            pet_id = result.get('id') if isinstance(result, dict) else getattr(result, 'id', None)
+        for callback in list(self._write_listeners):
+            callback(operation, get_key, pet_id, result)
+
+    def _invalidate_cache(self, operation: str, get_key: json, pet_id: str, result) -> None:
+        self.cache.invalidate(self.keys.current(get_key['key']))
+
+    @staticmethod
+    def _multipart(fields: dict, progress=None):
+        """Метод собирает потоковое тело multipart/form-data. Если передан progress, он вызывается
+        по мере отправки с аргументами (отправлено байт, всего байт)."""
+
+        from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+
+        encoder = MultipartEncoder(fields={name: value if isinstance(value, tuple) else str(value)
+                                           for name, value in fields.items()})
+        if progress is None:
+            return encoder
+        return MultipartEncoderMonitor(encoder, lambda monitor: progress(monitor.bytes_read, monitor.len))
 
     def get_api_key(self, email: str, password: str) -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
@@ -16,16 +288,18 @@ class PetFriends:
             'password': password
         }
 
-        res = requests.get(self.base_url+'api/key', headers=headers)
+        res = self._request('GET', 'api/key', headers=headers)
 
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except:
-            result = res.text
+        result = self._result(res)
         return status, result
 
+    def get_key(self, email: str, password: str) -> json:
+        """Метод возвращает статус и результат в формате get_api_key, но запрашивает ключ у сервера
+        только один раз для пары email/пароль: повторные вызовы берут ключ из кэша self.keys."""
+
+        return self.keys.get(email, password, self.get_api_key)
+
     def get_list_of_pets(self, get_key: json, filter: str = "") -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
         JSON со списком найденных питомцев, совпадающих с фильтром. Фильтр может иметь
@@ -33,38 +307,68 @@ class PetFriends:
         список питомцев пользователя."""
 
         headers = {'auth_key': get_key['key']}
-        filter = {'filter': filter}
+        params = {'filter': filter}
 
-        res = requests.get(self.base_url+'api/pets', headers=headers, params=filter)
+        if self.cache is None:
+            res = self._request('GET', 'api/pets', headers=headers, params=params)
+        else:
+            cache_key = (self.keys.current(get_key['key']), filter)
+            res, validators = self.cache.lookup(cache_key)
+            if validators is not None:
+                generation = self.cache.generation
+                fresh = self._request('GET', 'api/pets', headers=dict(headers, **validators), params=params)
+                self.cache.store(cache_key, fresh, generation)
+                if fresh.status_code != 304 or res is None:
+                    res = fresh
 
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except:
-            result = res.text
+        result = self._result(res, PetList)
         return status, result
 
-    def add_new_pet_with_photo(self, get_key: json, name: str, animal_type: str, age: int, pet_photo: str) -> json:
+    def iter_pets(self, get_key: json, filter: str = "", with_photo: bool = False, chunk_size: int = 1 << 16):
+        """Генератор запрашивает список питомцев, как get_list_of_pets, но разбирает ответ потоком и
+        возвращает питомцев по одному в виде объектов Pet (без фото, если with_photo=False), поэтому
+        потребление памяти не зависит от размера списка. При неуспешном ответе сервера
+        вызывается requests.HTTPError."""
+
+        headers = {'auth_key': get_key['key']}
+        filter = {'filter': filter}
+
+        with self._request('GET', 'api/pets', headers=headers, params=filter, stream=True) as res:
+            res.raise_for_status()
+            for pet in iter_json_array(res.iter_content(chunk_size)):
+                yield Pet.from_dict(pet, with_photo)
+
+    def pet_index(self, get_key: json, filter: str = 'my_pets') -> PetIndex:
+        """Метод создает и заполняет локальный индекс питомцев (см. PetIndex)."""
+
+        index = PetIndex(self, get_key, filter)
+        index.refresh()
+        return index
+
+    def add_new_pet_with_photo(self, get_key: json, name: str, animal_type: str, age: int, pet_photo,
+                               progress=None) -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
-        JSON с данными созданного питомца."""
+        JSON с данными созданного питомца. Фото (путь, bytes/memoryview или файлоподобный объект)
+        отправляется потоком с диска, не загружаясь в память целиком. Если задан photo_processor,
+        отправляется подготовленное им фото, а фото неподдерживаемого формата вызывает ValueError."""
 
         headers = {'auth_key': get_key['key']}
-        data = {
-            'name': name,
-            'animal_type': animal_type,
-            'age': age
-        }
-        file = {'pet_photo': (pet_photo, open(pet_photo, 'rb'), 'image/jpeg')}
+        if self.photo_processor is not None:
+            pet_photo = self.photo_processor.process(pet_photo)
+        with open_photo(pet_photo) as (filename, photo, content_type):
+            fields = {
+                'name': name,
+                'animal_type': animal_type,
+                'age': age,
+                'pet_photo': (filename, photo, content_type)
+            }
 
-        res = requests.post(self.base_url + 'api/pets', headers=headers, data=data, files=file)
+            res = self._request('POST', 'api/pets', headers=headers, fields=fields, progress=progress)
 
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except:
-            result = res.text
+        result = self._result(res, Pet)
+        self._notify_write('create', get_key, status, result=result)
         return status, result
 
     def update_pet_info(self, get_key: json, pet_id: str, name: str, animal_type: str, age: int) -> json:
@@ -78,14 +382,11 @@ class PetFriends:
             'age': age
         }
 
-        res = requests.put(self.base_url + 'api/pets/' + pet_id, headers=headers, data=data)
+        res = self._request('PUT', 'api/pets/' + pet_id, headers=headers, data=data, endpoint='api/pets/{id}')
 
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except:
-            result = res.text
+        result = self._result(res, Pet)
+        self._notify_write('update', get_key, status, pet_id, result)
         return status, result
 
     def delete_pet(self, get_key: json, pet_id: str) -> int:
@@ -93,46 +394,86 @@ class PetFriends:
 
         headers = {'auth_key': get_key['key']}
 
-        res = requests.delete(self.base_url + 'api/pets/' + pet_id, headers=headers)
+        res = self._request('DELETE', 'api/pets/' + pet_id, headers=headers, endpoint='api/pets/{id}')
 
         status = res.status_code
+        self._notify_write('delete', get_key, status, pet_id)
         return status
 
     def add_new_pet_simple(self, auth_key: json, name: str, animal_type: str, age: int) -> json:
         """Метод отправляет на сервер данные о добавляемом питомце и возвращает статус
         запроса и результат в формате JSON с данными добавленного питомца."""
 
-        data = MultipartEncoder(
-            fields={
-                'name': name,
-                'animal_type': animal_type,
-                'age': age
-            })
-        headers = {'auth_key': auth_key['key'], 'Content-Type': data.content_type}
+        fields = {
+            'name': name,
+            'animal_type': animal_type,
+            'age': age
+        }
+        headers = {'auth_key': auth_key['key']}
 
-        res = requests.post(self.base_url + 'api/create_pet_simple', headers=headers, data=data)
+        res = self._request('POST', 'api/create_pet_simple', headers=headers, fields=fields)
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        print(result)
+        result = self._result(res, Pet)
+        self._notify_write('create', auth_key, status, result=result)
         return status, result
 
-    def add_pet_photo(self, get_key: json, pet_id: str, pet_photo: str) -> json:
+    def add_pet_photo(self, get_key: json, pet_id: str, pet_photo, progress=None) -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
-        JSON с данными питомца, для которого добавлено фото."""
+        JSON с данными питомца, для которого добавлено фото. Фото отправляется потоком,
+        как в add_new_pet_with_photo."""
 
         headers = {'auth_key': get_key['key']}
-        file = {'pet_photo': (pet_photo, open(pet_photo, 'rb'), 'image/jpeg')}
+        if self.photo_processor is not None:
+            pet_photo = self.photo_processor.process(pet_photo)
+        with open_photo(pet_photo) as (filename, photo, content_type):
+            fields = {'pet_photo': (filename, photo, content_type)}
 
-        res = requests.post(self.base_url + 'api/pets/set_photo/' + pet_id, headers=headers, files=file)
+            res = self._request('POST', 'api/pets/set_photo/' + pet_id, headers=headers, fields=fields,
+                                progress=progress, endpoint='api/pets/set_photo/{id}')
 
         status = res.status_code
-        result = ""
-        try:
-            result = res.json()
-        except:
-            result = res.text
+        result = self._result(res, Pet)
+        self._notify_write('set_photo', get_key, status, pet_id, result)
         return status, result
+
+    def bulk_create(self, get_key: json, pets, workers: int = 8, rate_limit: float = None) -> BulkJob:
+        """Метод создает питомцев пакетно в пуле из workers потоков и возвращает BulkJob.
+        Каждый элемент pets - словарь с ключами name, animal_type, age и необязательным pet_photo:
+        питомцы с фото создаются через add_new_pet_with_photo, без фото - через add_new_pet_simple."""
+
+        def create(pet):
+            if pet.get('pet_photo') is not None:
+                return self.add_new_pet_with_photo(get_key, pet['name'], pet['animal_type'], pet['age'],
+                                                   pet['pet_photo'])
+            return self.add_new_pet_simple(get_key, pet['name'], pet['animal_type'], pet['age'])
+
+        return BulkJob(create, pets, workers, rate_limit)
+
+    def bulk_update(self, get_key: json, pets, workers: int = 8, rate_limit: float = None) -> BulkJob:
+        """Метод пакетно обновляет данные питомцев и возвращает BulkJob.
+        Каждый элемент pets - словарь с ключами pet_id, name, animal_type и age."""
+
+        return BulkJob(lambda pet: self.update_pet_info(get_key, pet['pet_id'], pet['name'], pet['animal_type'],
+                                                        pet['age']),
+                       pets, workers, rate_limit)
+
+    def bulk_set_photo(self, get_key: json, photos, workers: int = 8, rate_limit: float = None) -> BulkJob:
+        """Метод пакетно добавляет фото питомцам и возвращает BulkJob.
+        Каждый элемент photos - словарь с ключами pet_id и pet_photo."""
+
+        return BulkJob(lambda photo: self.add_pet_photo(get_key, photo['pet_id'], photo['pet_photo']),
+                       photos, workers, rate_limit)
+
+    def bulk_delete(self, get_key: json, pet_ids, workers: int = 8, rate_limit: float = None) -> BulkJob:
+        """Метод пакетно удаляет питомцев с указанными id и возвращает BulkJob."""
+
+        return BulkJob(lambda pet_id: self.delete_pet(get_key, pet_id), pet_ids, workers, rate_limit)
+
+    def cleanup_pets(self, get_key: json, name: str = None, animal_type: str = None, min_age: int = None,
+                     max_age: int = None, checkpoint: str = None, workers: int = 8, rate_limit: float = None,
+                     batch_size: int = 100) -> Cleanup:
+        """Метод возвращает задание очистки (см. cleanup.Cleanup), которое удаляет питомцев пользователя,
+        подходящих по имени, типу животного или возрасту, и выполняется методом run()."""
+
+        return Cleanup(self, get_key, name, animal_type, min_age, max_age, checkpoint=checkpoint, workers=workers,
+                       rate_limit=rate_limit, batch_size=batch_size)
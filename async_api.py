@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from keys import KeyManager
+from models import loads
+from photos import open_photo
+from throttle import parse_retry_after
+
+
+async def _read_chunks(photo, chunk_size: int = 1 << 16):
+    """Генератор читает файл частями в пуле потоков. В отличие от передачи самого файла в aiohttp,
+    файл после отправки остается открытым: его закрывает open_photo, а при повторе запроса
+    его можно перемотать на начало."""
+
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, photo.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AsyncPetFriends:
+    def __init__(self, base_url: str = "https://petfriends.skillfactory.ru/", concurrency: int = 50,
+                 pool_maxsize: int = 100, connect_timeout: float = 5, read_timeout: float = 30,
+                 keys: KeyManager = None, rate_limiter=None, concurrency_limiter=None):
+        """Асинхронный клиент PetFriends с теми же методами и тем же форматом ответа (status, result),
+        что и PetFriends. Все запросы идут через общий пул соединений, а количество одновременно
+        выполняемых запросов ограничено семафором concurrency. Кэш ключей keys можно разделить
+        с синхронным клиентом (PetFriends.keys). rate_limiter и concurrency_limiter - ограничители
+        частоты и количества одновременных запросов, как в PetFriends (их можно разделить с ним).
+        Сессия и семафор привязываются к циклу событий первого запроса. Чтобы использовать клиент
+        в другом цикле (например, в следующем asyncio.run), его нужно сначала закрыть (close или
+        async with), иначе вызывается RuntimeError."""
+
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.pool_maxsize = pool_maxsize
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self._semaphore = None
+        self._session = None
+        self._loop = None
+        self.keys = keys if keys is not None else KeyManager()
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _bind(self) -> None:
+        """Метод привязывает сессию и семафор к текущему циклу событий. Незакрытую сессию другого
+        цикла использовать нельзя: ее соединения принадлежат тому циклу."""
+
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        if self._session is not None and not self._session.closed:
+            raise RuntimeError('AsyncPetFriends is bound to another event loop; close it before reusing')
+        self._loop = loop
+        self._session = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия создается при первом запросе, так как ей нужен запущенный цикл событий."""
+
+        self._bind()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        """Метод закрывает сессию и все соединения из пула."""
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, path: str, headers: dict = None, fields: dict = None, **kwargs):
+        """Метод отправляет запрос, соблюдая ограничение на количество одновременных запросов,
+        и возвращает статус запроса и тело ответа в виде JSON или текста. Если передан fields, тело
+        отправляется в формате multipart/form-data (файлы - кортежи (имя, объект, тип) - потоком).
+        Если на запрос с ключом из self.keys сервер ответил 403, ключ обновляется и запрос
+        повторяется один раз."""
+
+        self._bind()
+        headers = dict(headers or {})
+        if 'auth_key' in headers:
+            headers['auth_key'] = self.keys.current(headers['auth_key'])
+        files = [(value[1], value[1].tell()) for value in (fields or {}).values() if isinstance(value, tuple)]
+
+        for attempt in range(2):
+            if fields is not None:
+                for photo, position in files:
+                    photo.seek(position)
+                kwargs['data'] = self._form(fields)
+            async with self._semaphore:
+                status, body = await self._send(method, path, headers, **kwargs)
+
+            stale_key = headers.get('auth_key')
+            if attempt or status != 403 or self.keys.credentials(stale_key) is None:
+                break
+            new_key = await self.keys.arefresh(stale_key, self.get_api_key)
+            if new_key is None:
+                break
+            headers['auth_key'] = new_key
+
+        try:
+            result = loads(body)
+        except ValueError:
+            result = body.decode('utf-8', 'replace')
+        return status, result
+
+    async def _send(self, method: str, path: str, headers: dict, **kwargs):
+        """Метод отправляет запрос, соблюдая ограничения self.rate_limiter и self.concurrency_limiter,
+        и возвращает статус и тело ответа."""
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire()
+        if self.concurrency_limiter is not None:
+            await self.concurrency_limiter.aacquire()
+        start = time.perf_counter()
+        status = retry_after = None
+        try:
+            async with self.session.request(method, self.base_url + path, headers=headers, **kwargs) as res:
+                body = await res.read()
+                status = res.status
+                retry_after = parse_retry_after(res.headers.get('Retry-After'))
+        finally:
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.release(status, time.perf_counter() - start, retry_after)
+        if retry_after and self.rate_limiter is not None:
+            self.rate_limiter.pause(retry_after)
+        return status, body
+
+    @staticmethod
+    def _form(fields: dict) -> aiohttp.FormData:
+        # Как и в синхронном клиенте, данные отправляются в формате multipart/form-data.
+        form = aiohttp.FormData(default_to_multipart=True)
+        for name, value in fields.items():
+            if isinstance(value, tuple):
+                filename, photo, content_type = value
+                form.add_field(name, _read_chunks(photo), filename=filename, content_type=content_type)
+            else:
+                form.add_field(name, str(value))
+        return form
+
+    async def _send_photo(self, path: str, headers: dict, fields: dict, pet_photo):
+        """Метод отправляет фото вместе с полями формы потоком, закрывая файл после запроса."""
+
+        with open_photo(pet_photo) as (filename, photo, content_type):
+            fields = dict(fields, pet_photo=(filename, photo, content_type))
+            return await self._request('POST', path, headers=headers, fields=fields)
+
+    async def get_api_key(self, email: str, password: str) -> json:
+        """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
+        JSON с уникальным ключом пользователя, найденного по указанным email и паролем."""
+
+        headers = {
+            'email': email,
+            'password': password
+        }
+        return await self._request('GET', 'api/key', headers=headers)
+
+    async def get_key(self, email: str, password: str) -> json:
+        """Метод возвращает ключ в формате get_api_key, запрашивая его у сервера только один раз
+        для пары email/пароль; одновременные вызовы ожидают общий запрос."""
+
+        return await self.keys.aget(email, password, self.get_api_key)
+
+    async def get_list_of_pets(self, get_key: json, filter: str = "") -> json:
+        """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
+        JSON со списком найденных питомцев, совпадающих с фильтром."""
+
+        headers = {'auth_key': get_key['key']}
+        return await self._request('GET', 'api/pets', headers=headers, params={'filter': filter})
+
+    async def add_new_pet_with_photo(self, get_key: json, name: str, animal_type: str, age: int,
+                                     pet_photo) -> json:
+        """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
+        JSON с данными созданного питомца."""
+
+        headers = {'auth_key': get_key['key']}
+        fields = {'name': name, 'animal_type': animal_type, 'age': age}
+        return await self._send_photo('api/pets', headers, fields, pet_photo)
+
+    async def update_pet_info(self, get_key: json, pet_id: str, name: str, animal_type: str, age: int) -> json:
+        """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
+        JSON с обновленными данными питомца с указанным id."""
+
+        headers = {'auth_key': get_key['key']}
+        data = {
+            'name': name,
+            'animal_type': animal_type,
+            'age': str(age)
+        }
+        return await self._request('PUT', 'api/pets/' + pet_id, headers=headers, data=data)
+
+    async def delete_pet(self, get_key: json, pet_id: str) -> int:
+        """Метод делает запрос к API сервера на удаление питомца и возвращает статус запроса."""
+
+        headers = {'auth_key': get_key['key']}
+        status, _ = await self._request('DELETE', 'api/pets/' + pet_id, headers=headers)
+        return status
+
+    async def add_new_pet_simple(self, auth_key: json, name: str, animal_type: str, age: int) -> json:
+        """Метод отправляет на сервер данные о добавляемом питомце и возвращает статус
+        запроса и результат в формате JSON с данными добавленного питомца."""
+
+        headers = {'auth_key': auth_key['key']}
+        fields = {'name': name, 'animal_type': animal_type, 'age': age}
+        return await self._request('POST', 'api/create_pet_simple', headers=headers, fields=fields)
+
+    async def add_pet_photo(self, get_key: json, pet_id: str, pet_photo) -> json:
+        """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
+        JSON с данными питомца, для которого добавлено фото."""
+
+        headers = {'auth_key': get_key['key']}
+        return await self._send_photo('api/pets/set_photo/' + pet_id, headers, {}, pet_photo)
+
+    async def gather_create(self, get_key: json, pets) -> list:
+        """Метод создает питомцев без фото параллельно (в пределах ограничения concurrency) и возвращает
+        список результатов (status, result) в том же порядке, что и входные данные.
+        Каждый элемент pets - словарь с ключами name, animal_type и age."""
+
+        return await asyncio.gather(*(self.add_new_pet_simple(get_key, pet['name'], pet['animal_type'], pet['age'])
+                                      for pet in pets))
+
+    async def gather_delete(self, get_key: json, pet_ids) -> list:
+        """Метод удаляет питомцев параллельно и возвращает список статусов в том же порядке, что и pet_ids."""
+
+        return await asyncio.gather(*(self.delete_pet(get_key, pet_id) for pet_id in pet_ids))
@@ -0,0 +1,54 @@
+"""Бенчмарк пропускной способности: синхронный PetFriends против AsyncPetFriends
+с разными ограничениями concurrency при создании питомцев через api/create_pet_simple.
+Локальный заменитель сервера (mock_server.py) добавляет к каждому ответу задержку, имитирующую сеть.
+
+Запуск: python benchmarks/bench_async.py [количество запросов] [задержка в мс]"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import PetFriends  # noqa: E402
+from async_api import AsyncPetFriends  # noqa: E402
+from mock_server import MockPetFriendsServer  # noqa: E402
+
+EMAIL, PASSWORD = 'bench@example.com', 'bench'
+
+
+def _pets(n: int) -> list:
+    return [{'name': f'Deyk{i}', 'animal_type': 'dog', 'age': str(i % 10)} for i in range(n)]
+
+
+def bench_sync(base_url: str, n: int) -> float:
+    with PetFriends(base_url=base_url) as pf:
+        _, key = pf.get_key(EMAIL, PASSWORD)
+        start = time.perf_counter()
+        for pet in _pets(n):
+            pf.add_new_pet_simple(key, pet['name'], pet['animal_type'], pet['age'])
+        return n / (time.perf_counter() - start)
+
+
+async def bench_async(base_url: str, n: int, concurrency: int) -> float:
+    async with AsyncPetFriends(base_url=base_url, concurrency=concurrency) as pf:
+        _, key = await pf.get_key(EMAIL, PASSWORD)
+        start = time.perf_counter()
+        results = await pf.gather_create(key, _pets(n))
+        elapsed = time.perf_counter() - start
+    assert all(status == 200 for status, _ in results)
+    return n / elapsed
+
+
+def main(n: int = 500, latency_ms: float = 5):
+    with MockPetFriendsServer(users={EMAIL: PASSWORD}, latency=latency_ms / 1000) as server:
+        print(f"{'sync':<16} {bench_sync(server.base_url, n):8.1f} запросов/с")
+        for concurrency in (1, 4, 16, 64):
+            rps = asyncio.run(bench_async(server.base_url, n, concurrency))
+            print(f"{'async c=' + str(concurrency):<16} {rps:8.1f} запросов/с")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 5)
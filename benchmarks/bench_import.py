@@ -0,0 +1,51 @@
+"""Бенчмарк времени запуска: сколько стоит импорт модулей клиента в новом процессе интерпретатора
+(по данным python -X importtime) и какие тяжелые зависимости при этом загружаются.
+
+Запуск: python benchmarks/bench_import.py [количество запусков] [модуль ...]"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Зависимости, которые должны загружаться только при первом запросе или первом чтении настроек.
+HEAVY_MODULES = ('requests', 'requests_toolbelt', 'urllib3', 'dotenv', 'asyncio', 'concurrent.futures')
+
+# Бюджет на импорт api и settings в секундах (до отложенных импортов - около 65 мс).
+IMPORT_BUDGET = 0.04
+
+
+def import_time(modules=('api', 'settings'), runs: int = 5) -> tuple:
+    """Функция импортирует modules в новом процессе runs раз и возвращает (минимальное суммарное
+    время импорта в секундах, список загруженных тяжелых модулей из HEAVY_MODULES)."""
+
+    code = f"import sys; import {', '.join(modules)}; " \
+           f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    best, loaded = None, []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        total = 0
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package; верхний уровень - без отступа.
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() in modules and parts[2][1] != ' ':
+                total += int(parts[1])
+        best = total if best is None else min(best, total)
+        loaded = [name for name in result.stdout.strip().split(',') if name]
+    return best / 1e6, loaded
+
+
+def main(runs: int = 5, modules=('api', 'settings')) -> int:
+    """Функция печатает результат и возвращает код завершения 1, если импорт не укладывается
+    в бюджет IMPORT_BUDGET или загружает тяжелые модули."""
+
+    seconds, loaded = import_time(modules, runs)
+    print(f"import {', '.join(modules)}: {seconds * 1000:.1f} мс (бюджет {IMPORT_BUDGET * 1000:.0f} мс)")
+    print(f"тяжелые модули: {', '.join(loaded) or 'нет'}")
+    return int(seconds >= IMPORT_BUDGET or bool(loaded))
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, tuple(sys.argv[2:]) or ('api', 'settings')))
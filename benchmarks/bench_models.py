@@ -0,0 +1,57 @@
+"""Бенчмарк памяти и времени разбора ответа GET api/pets на синтетическом списке из 100 тысяч питомцев:
+словари из json.loads (текущее представление) против PetList/Pet из models.py.
+
+Запуск: python benchmarks/bench_models.py [количество питомцев]"""
+
+import base64
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: E402
+from models import PetList  # noqa: E402
+
+
+def _payload(n: int) -> bytes:
+    photo = 'data:image/jpeg;base64,' + base64.b64encode(os.urandom(600)).decode()
+    pets = [{'id': f'{i:024x}', 'name': f'Deyk{i}', 'animal_type': 'dog', 'age': str(i % 20),
+             'created_at': '1690000000.123', 'user_id': 'a' * 24,
+             'pet_photo': photo if i % 10 == 0 else ''} for i in range(n)]
+    return json.dumps({'pets': pets}).encode()
+
+
+def _measure(parse, payload: bytes):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = parse(payload)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main(n: int = 100_000):
+    payload = _payload(n)
+    print(f"ответ: {len(payload) / 2 ** 20:.1f} МБ, питомцев: {n}, orjson: {models.orjson is not None}")
+
+    variants = [('dict (json.loads)', lambda data: json.loads(data)['pets']),
+                ('PetList', PetList.from_json),
+                ('PetList без фото', lambda data: PetList.from_json(data, with_photo=False))]
+    for title, parse in variants:
+        # Время разбора измеряется отдельно от памяти: tracemalloc заметно замедляет выделения.
+        gc.collect()
+        start = time.perf_counter()
+        parse(payload)
+        elapsed = time.perf_counter() - start
+        _, _, size = _measure(parse, payload)
+        print(f"{title:<20} разбор={elapsed * 1000:8.1f} мс  память={size / 2 ** 20:7.1f} МБ")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,50 @@
+"""Бенчмарк задержки одного запроса: пул keep-alive соединений PetFriends против
+отдельного соединения на каждый вызов requests.get на локальном заменителе сервера (mock_server.py).
+
+Запуск: python benchmarks/bench_pool.py [количество запросов]"""
+
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import PetFriends  # noqa: E402
+from mock_server import MockPetFriendsServer  # noqa: E402
+
+
+def _measure(call, n: int) -> list:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(title: str, timings: list):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+    print(f"{title:<10} mean={statistics.mean(timings) * 1000:.3f} мс  p50={p50:.3f} мс  p99={p99:.3f} мс")
+
+
+def main(n: int = 1000):
+    with MockPetFriendsServer(users={'bench@example.com': 'bench'}) as server:
+        server.add_pet('bench@example.com', 'Deyk', 'dog', 3)
+        with PetFriends(base_url=server.base_url) as pf:
+            _, key = pf.get_key('bench@example.com', 'bench')
+            # Без пула: каждый вызов открывает и закрывает новое соединение.
+            unpooled = _measure(lambda: requests.get(server.base_url + 'api/pets', headers={'auth_key': key['key']},
+                                                     params={'filter': ''}), n)
+            pooled = _measure(lambda: pf.get_list_of_pets(key, ''), n)
+
+    _report('unpooled', unpooled)
+    _report('pooled', pooled)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,76 @@
+"""Бенчмарк пикового потребления памяти (RSS) при загрузке большого фото через add_pet_photo.
+Фото отправляется потоком, поэтому прирост пиковой памяти не должен зависеть от размера файла.
+
+Запуск: python benchmarks/bench_upload.py [размер файла в МБ]"""
+
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api import PetFriends  # noqa: E402
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux измеряется в килобайтах.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _start_server():
+    """Сервер запускается отдельным процессом, чтобы принятое им фото не учитывалось в RSS клиента."""
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'mock_server.py'), '--port', str(port),
+                               '--user', 'bench@example.com:bench'], stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return server, f'http://127.0.0.1:{port}/'
+
+
+def main(size_mb: int = 100):
+    server, base_url = _start_server()
+    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as photo:
+        photo.write(b'\xff\xd8\xff\xe0')
+        chunk = os.urandom(1 << 20)
+        for _ in range(size_mb):
+            photo.write(chunk)
+    try:
+        with PetFriends(base_url=base_url) as pf:
+            _, key = pf.get_key('bench@example.com', 'bench')
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+            uploaded = {}
+
+            def progress(sent: int, total: int):
+                # Пик памяти фиксируется в момент окончания отправки: ответ сервера содержит загруженное
+                # фото в base64 и не должен учитываться.
+                if sent >= total and 'rss' not in uploaded:
+                    uploaded['rss'] = _peak_rss_mb()
+                    uploaded['time'] = time.perf_counter()
+
+            before = _peak_rss_mb()
+            start = time.perf_counter()
+            status, _ = pf.add_pet_photo(key, pet['id'], photo.name, progress=progress)
+            elapsed = uploaded['time'] - start
+            after = uploaded['rss']
+    finally:
+        os.remove(photo.name)
+        server.terminate()
+
+    print(f"статус={status} файл={size_mb} МБ время={elapsed:.2f} с "
+          f"пиковый RSS до={before:.1f} МБ после={after:.1f} МБ прирост={after - before:.1f} МБ")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,138 @@
+import time
+
+from throttle import TokenBucket
+
+
+class BulkItemResult:
+    """Результат одной операции пакетного запроса: порядковый номер и исходный элемент,
+    статус и тело ответа, исключение (если запрос не был выполнен) и время выполнения в секундах."""
+
+    __slots__ = ('index', 'item', 'status', 'result', 'error', 'elapsed')
+
+    def __init__(self, index: int, item, status: int = None, result=None, error: Exception = None,
+                 elapsed: float = 0.0):
+        self.index = index
+        self.item = item
+        self.status = status
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+    def __repr__(self):
+        return f"BulkItemResult(index={self.index}, status={self.status}, error={self.error!r})"
+
+
+class BulkSummary:
+    """Итог пакетного запроса: успешные и неуспешные операции, общее время и перцентили
+    времени выполнения отдельных операций."""
+
+    def __init__(self, successes: list, failures: list, elapsed: float):
+        self.successes = successes
+        self.failures = failures
+        self.elapsed = elapsed
+        timings = sorted(r.elapsed for r in successes + failures)
+        self.percentiles = {name: _percentile(timings, q)
+                            for name, q in (('p50', 50), ('p90', 90), ('p95', 95), ('p99', 99), ('max', 100))}
+
+    @property
+    def total(self) -> int:
+        return len(self.successes) + len(self.failures)
+
+    def as_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'successes': len(self.successes),
+            'failures': [{'index': r.index, 'item': r.item, 'status': r.status,
+                          'result': r.result if r.error is None else repr(r.error)} for r in self.failures],
+            'elapsed': self.elapsed,
+            'percentiles': self.percentiles,
+        }
+
+    def __repr__(self):
+        return (f"BulkSummary(total={self.total}, successes={len(self.successes)}, "
+                f"failures={len(self.failures)}, elapsed={self.elapsed:.3f})")
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class BulkJob:
+    """Пакетное выполнение операции func над элементами items в пуле потоков.
+
+    Выполнение начинается при итерации по объекту или вызове summary(). Итерация возвращает
+    BulkItemResult по мере завершения операций (не в порядке входных данных). items может быть
+    генератором: в работе одновременно находится не более 2 * workers элементов, поэтому входные
+    данные не загружаются в память целиком. rate_limit - максимальное количество запросов в секунду."""
+
+    def __init__(self, func, items, workers: int = 8, rate_limit: float = None):
+        self._func = func
+        self._items = items
+        self._workers = workers
+        self._limiter = TokenBucket(rate_limit) if rate_limit else None
+        self._successes = []
+        self._failures = []
+        self._elapsed = None
+        self._started = False
+
+    def _call(self, index: int, item) -> BulkItemResult:
+        if self._limiter is not None:
+            self._limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self._func(item)
+        except Exception as e:
+            return BulkItemResult(index, item, error=e, elapsed=time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+        # delete_pet возвращает только статус, остальные методы - (статус, результат).
+        if isinstance(response, tuple):
+            status, result = response
+        else:
+            status, result = response, None
+        return BulkItemResult(index, item, status, result, elapsed=elapsed)
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError('BulkJob can only be run once')
+        self._started = True
+        # concurrent.futures загружает logging, поэтому импортируется только при запуске задания.
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        start = time.perf_counter()
+        items = enumerate(self._items)
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            pending = set()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < 2 * self._workers:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(self._call, index, item))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item_result = future.result()
+                    (self._successes if item_result.ok else self._failures).append(item_result)
+                    yield item_result
+        self._elapsed = time.perf_counter() - start
+
+    def summary(self) -> BulkSummary:
+        """Метод дожидается завершения всех операций и возвращает итог пакетного запроса."""
+
+        if not self._started:
+            for _ in self:
+                pass
+        elif self._elapsed is None:
+            raise RuntimeError('BulkJob iteration was not finished')
+        return BulkSummary(self._successes, self._failures, self._elapsed)
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('response', 'expires', 'validators')
+
+    def __init__(self, response, expires: float):
+        self.response = response
+        self.expires = expires
+        self.validators = {}
+        if response.headers.get('ETag'):
+            self.validators['If-None-Match'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            self.validators['If-Modified-Since'] = response.headers['Last-Modified']
+
+
+class ResponseCache:
+    """Кэш ответов GET api/pets по ключу (auth_key, filter) (передается клиенту параметром cache).
+
+    Ответ считается свежим ttl секунд и в это время отдается без запроса к серверу. Устаревший
+    ответ, для которого сервер вернул ETag или Last-Modified, не удаляется, а проверяется
+    условным запросом (If-None-Match / If-Modified-Since): на ответ 304 клиент отдает
+    сохраненный ответ и продлевает его свежесть. Хранится не больше maxsize ответов, при
+    переполнении удаляется тот, к которому дольше всего не обращались.
+
+    Успешные изменения питомцев через клиент удаляют из кэша списки этого ключа и общие списки
+    (filter=''). Счетчики: hits - ответ отдан без запроса, revalidations - сервер ответил 304,
+    misses - ответ получен от сервера заново, invalidations - удалено записей после изменений."""
+
+    def __init__(self, ttl: float = 30, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        # Увеличивается при каждой инвалидации, чтобы не сохранить ответ на запрос,
+        # отправленный до изменения.
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: tuple):
+        """Метод возвращает (ответ, заголовки для условного запроса). Если есть свежий ответ,
+        он возвращается с заголовками None, и запрос к серверу не нужен; если ответа нет - (None, {})."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, {}
+            self._entries.move_to_end(key)
+            if time.monotonic() < entry.expires:
+                self.hits += 1
+                return entry.response, None
+            return entry.response, dict(entry.validators)
+
+    def store(self, key: tuple, response, generation: int = None) -> None:
+        """Метод сохраняет ответ 200 (или продлевает сохраненный ответ, если сервер вернул 304).
+        generation - значение self.generation перед отправкой запроса."""
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.misses += 1
+                return
+            if response.status_code == 304:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.expires = time.monotonic() + self.ttl
+                    self.revalidations += 1
+                return
+            self.misses += 1
+            if response.status_code != 200:
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = _Entry(response, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, auth_key: str = None) -> None:
+        """Метод удаляет списки ключа auth_key и общие списки, а без аргумента - все записи."""
+
+        with self._lock:
+            stale = [key for key in self._entries if auth_key is None or key[0] == auth_key or key[1] == '']
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses,
+                    'invalidations': self.invalidations, 'size': len(self._entries)}
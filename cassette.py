@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import json
+import mmap
+import os
+import threading
+
+from models import loads
+
+# Заголовки, значения которых не записываются в кассету: вместо них сохраняется '<redacted>',
+# а в ключ совпадения входит только их хэш.
+SECRET_HEADERS = ('auth_key', 'email', 'password')
+
+_SKIP_RESPONSE_HEADERS = ('set-cookie', 'content-encoding', 'transfer-encoding', 'connection')
+
+# Каждая строка кассеты начинается с ключа совпадения, поэтому индекс строится без разбора JSON.
+_KEY_PREFIX = b'{"key": "'
+_KEY_LENGTH = 64
+
+
+def body_sha256(fields: dict = None) -> str:
+    """Функция возвращает sha256 тела запроса в каноническом виде: поля в отсортированном порядке,
+    файлы - в виде имени, типа и sha256 содержимого. Граница multipart при каждой отправке
+    новая, поэтому хэшировать закодированное тело нельзя."""
+
+    canonical = {}
+    for name, value in (fields or {}).items():
+        if isinstance(value, tuple):
+            filename, fileobj, content_type = value
+            position = fileobj.tell()
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: fileobj.read(1 << 16), b''):
+                digest.update(chunk)
+            fileobj.seek(position)
+            canonical[name] = {'filename': filename, 'content_type': content_type, 'sha256': digest.hexdigest()}
+        else:
+            canonical[name] = str(value)
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class Cassette:
+    """Запись и воспроизведение обмена клиента с сервером (передается клиенту параметром cassette).
+
+    В режиме 'record' каждый запрос и ответ дописываются строкой JSON в файл path через буфер
+    (метод, путь, параметры, заголовки без секретов, sha256 тела, статус, заголовки и тело ответа).
+    В режиме 'replay' файл отображается в память (mmap), при открытии строится индекс
+    ключ совпадения -> смещения строк, и ответы отдаются без обращения к серверу: поиск занимает O(1),
+    а разбирается только найденная строка. Если один и тот же запрос записан несколько раз
+    (например, список питомцев до и после удаления), ответы отдаются в порядке записи, а после
+    последнего повторяется последний. Если запрос не найден, вызывается LookupError."""
+
+    def __init__(self, path: str, mode: str = 'replay', buffer_size: int = 1 << 20):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self._index = {}
+        self._cursors = {}
+        if mode == 'record':
+            self._file = open(path, 'ab', buffering=buffer_size)
+        else:
+            self._open_replay()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(len(offsets) for offsets in self._index.values())
+
+    def _open_replay(self):
+        with open(self.path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        data, start, size = self._mmap, 0, len(self._mmap)
+        while start < size:
+            end = data.find(b'\n', start)
+            if end < 0:
+                end = size
+            if data[start:start + len(_KEY_PREFIX)] == _KEY_PREFIX:
+                key = data[start + len(_KEY_PREFIX):start + len(_KEY_PREFIX) + _KEY_LENGTH].decode()
+                self._index.setdefault(key, []).append((start, end))
+            start = end + 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """Метод записывает буфер на диск и закрывает файл кассеты."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+    @staticmethod
+    def match_key(method: str, path: str, params: dict = None, headers: dict = None, body: str = '') -> str:
+        """Метод возвращает ключ совпадения запроса: sha256 от метода, пути, параметров, хэша тела body
+        (см. body_sha256) и значений секретных заголовков."""
+
+        digest = hashlib.sha256()
+        digest.update(method.upper().encode() + b' ' + path.encode() + b'\n')
+        digest.update(json.dumps({name: str(value) for name, value in (params or {}).items()},
+                                 sort_keys=True, ensure_ascii=False).encode() + b'\n')
+        for name in SECRET_HEADERS:
+            value = (headers or {}).get(name)
+            digest.update(f'{name}={"" if value is None else value}\n'.encode())
+        digest.update(body.encode())
+        return digest.hexdigest()
+
+    def record(self, key: str, method: str, path: str, params: dict, headers: dict, body: str, response) -> None:
+        """Метод дописывает запрос и ответ в кассету. body - хэш тела запроса (см. body_sha256)."""
+
+        content = response.content
+        try:
+            content_fields = {'body': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            content_fields = {'body_base64': base64.b64encode(content).decode()}
+        entry = {
+            'key': key,
+            'method': method,
+            'path': path,
+            'params': {name: str(value) for name, value in (params or {}).items()},
+            'headers': {name: '<redacted>' if name in SECRET_HEADERS else value
+                        for name, value in (headers or {}).items() if name != 'Content-Type'},
+            'body_sha256': body,
+            'status': response.status_code,
+            'response_headers': {name: value for name, value in response.headers.items()
+                                 if name.lower() not in _SKIP_RESPONSE_HEADERS},
+        }
+        entry.update(content_fields)
+        line = json.dumps(entry, ensure_ascii=False).encode() + b'\n'
+        with self._lock:
+            self._file.write(line)
+
+    def play(self, key: str, url: str = None):
+        """Метод возвращает записанный ответ на запрос с ключом key (requests.Response)."""
+
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        with self._lock:
+            offsets = self._index.get(key)
+            if not offsets:
+                raise LookupError(f"Request {key} is not recorded in cassette {self.path}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = min(cursor + 1, len(offsets) - 1)
+            start, end = offsets[cursor]
+            entry = loads(self._mmap[start:end])
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['response_headers'])
+        if 'body_base64' in entry:
+            response._content = base64.b64decode(entry['body_base64'])
+        else:
+            response._content = entry['body'].encode('utf-8')
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        response.url = url
+        return response
@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import time
+
+from models import parse_age
+
+# Статусы ответа на удаление, после которых питомец считается удаленным: 404 - его уже нет.
+_DELETED_STATUSES = (200, 404)
+
+
+class CleanupSummary:
+    """Итог очистки: matched - найдено подходящих питомцев, deleted - удалено в этом запуске,
+    verified - удаление подтверждено списком питомцев, failures - (id, причина) для питомцев, которых
+    удалить не удалось, resumed - запуск продолжил прерванную очистку, elapsed - время в секундах."""
+
+    def __init__(self, matched: int, deleted: int, verified: int, failures: list, resumed: bool, elapsed: float):
+        self.matched = matched
+        self.deleted = deleted
+        self.verified = verified
+        self.failures = failures
+        self.resumed = resumed
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def as_dict(self) -> dict:
+        return {'matched': self.matched, 'deleted': self.deleted, 'verified': self.verified,
+                'failures': [{'id': pet_id, 'reason': reason} for pet_id, reason in self.failures],
+                'resumed': self.resumed, 'elapsed': self.elapsed}
+
+    def __repr__(self):
+        return (f"CleanupSummary(matched={self.matched}, deleted={self.deleted}, verified={self.verified}, "
+                f"failures={len(self.failures)}, elapsed={self.elapsed:.3f})")
+
+
+class Cleanup:
+    """Очистка аккаунта от питомцев, накопленных тестами.
+
+    Список питомцев (filter, по умолчанию my_pets) разбирается потоком (см. PetFriends.iter_pets),
+    и выбираются питомцы, у которых имя и тип животного подходят под регулярные выражения name
+    и animal_type (re.fullmatch), а возраст - целое число от min_age до max_age. Должен быть задан
+    хотя бы один критерий. Выбранные питомцы удаляются пакетно (см. PetFriends.bulk_delete) в пуле из
+    workers потоков, а после каждых batch_size удалений один запрос списка проверяет, что они
+    действительно исчезли: питомцы, оставшиеся в списке, попадают в failures.
+
+    Если задан checkpoint, план (id выбранных питомцев), удаления и проверки дописываются в этот файл
+    строками JSON. Прерванная очистка с тем же файлом продолжается с места остановки: список заново
+    не разбирается (поэтому питомцы, созданные после начала очистки, не удаляются), уже удаленные
+    питомцы не удаляются повторно, а неудачные удаления повторяются. После успешной очистки файл
+    удаляется, поэтому повторный запуск безопасен."""
+
+    def __init__(self, client, get_key, name: str = None, animal_type: str = None, min_age: int = None,
+                 max_age: int = None, filter: str = 'my_pets', checkpoint: str = None, workers: int = 8,
+                 rate_limit: float = None, batch_size: int = 100):
+        if name is None and animal_type is None and min_age is None and max_age is None:
+            raise ValueError('Cleanup needs at least one of name, animal_type, min_age, max_age')
+        self._client = client
+        self._key = get_key
+        self._name = re.compile(name) if name is not None else None
+        self._animal_type = re.compile(animal_type) if animal_type is not None else None
+        self._min_age = min_age
+        self._max_age = max_age
+        self._filter = filter
+        self.checkpoint = checkpoint
+        self._workers = workers
+        self._rate_limit = rate_limit
+        self._batch_size = batch_size
+
+    def matches(self, pet) -> bool:
+        """Метод проверяет, подходит ли питомец (Pet или словарь из ответа API) под критерии очистки."""
+
+        get = pet.get if isinstance(pet, dict) else lambda field: getattr(pet, field)
+        if self._name is not None and not self._name.fullmatch(get('name') or ''):
+            return False
+        if self._animal_type is not None and not self._animal_type.fullmatch(get('animal_type') or ''):
+            return False
+        if self._min_age is not None or self._max_age is not None:
+            age = parse_age(get('age'))
+            if not isinstance(age, int):
+                return False
+            if self._min_age is not None and age < self._min_age:
+                return False
+            if self._max_age is not None and age > self._max_age:
+                return False
+        return True
+
+    def _load(self):
+        """Метод возвращает (план, удаленные id, подтвержденные id) из файла checkpoint
+        или (None, set(), set()), если прерванной очистки нет."""
+
+        planned, deleted, verified = None, set(), set()
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return planned, deleted, verified
+        with open(self.checkpoint, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла быть записана не полностью.
+                    continue
+                if 'planned' in entry:
+                    planned = entry['planned']
+                elif 'deleted' in entry:
+                    deleted.add(entry['deleted'])
+                elif 'undeleted' in entry:
+                    deleted.discard(entry['undeleted'])
+                elif 'verified' in entry:
+                    verified.update(entry['verified'])
+        return planned, deleted, verified
+
+    def _write(self, file, entry: dict) -> None:
+        if file is not None:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            file.flush()
+
+    def _verify(self, file, pet_ids: list, failures: list) -> int:
+        """Метод одним запросом списка проверяет, что питомцев pet_ids больше нет,
+        и возвращает количество подтвержденных удалений."""
+
+        remaining = {pet.id for pet in self._client.iter_pets(self._key, self._filter)}
+        verified = [pet_id for pet_id in pet_ids if pet_id not in remaining]
+        for pet_id in pet_ids:
+            if pet_id in remaining:
+                failures.append((pet_id, 'still listed after delete'))
+                self._write(file, {'undeleted': pet_id})
+        self._write(file, {'verified': verified})
+        return len(verified)
+
+    def run(self) -> CleanupSummary:
+        """Метод выполняет (или продолжает) очистку и возвращает CleanupSummary."""
+
+        start = time.perf_counter()
+        planned, deleted, verified = self._load()
+        resumed = planned is not None
+        failures, deleted_now, verified_now = [], 0, 0
+        file = open(self.checkpoint, 'a', encoding='utf-8') if self.checkpoint is not None else None
+        try:
+            if planned is None:
+                planned = [pet.id for pet in self._client.iter_pets(self._key, self._filter) if self.matches(pet)]
+                self._write(file, {'planned': planned})
+
+            # Удаленные, но не подтвержденные до прерывания питомцы проверяются в первой партии.
+            unverified = [pet_id for pet_id in planned if pet_id in deleted and pet_id not in verified]
+            pending = [pet_id for pet_id in planned if pet_id not in deleted]
+            batches = [pending[i:i + self._batch_size] for i in range(0, len(pending), self._batch_size)] or [[]]
+            for batch in batches:
+                for item in self._client.bulk_delete(self._key, batch, self._workers, self._rate_limit):
+                    if item.error is None and item.status in _DELETED_STATUSES:
+                        unverified.append(item.item)
+                        deleted_now += 1
+                        self._write(file, {'deleted': item.item, 'status': item.status})
+                    else:
+                        failures.append((item.item, repr(item.error) if item.error is not None
+                                         else f'status {item.status}'))
+                if unverified:
+                    verified_now += self._verify(file, unverified, failures)
+                    unverified = []
+        finally:
+            if file is not None:
+                file.close()
+        if self.checkpoint is not None and not failures:
+            os.remove(self.checkpoint)
+        return CleanupSummary(len(planned), deleted_now, verified_now, failures, resumed,
+                              time.perf_counter() - start)
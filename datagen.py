@@ -0,0 +1,100 @@
+from itertools import combinations
+
+
+class Case:
+    """Тестовый случай: значения параметров (values) и идентификатор для отчета pytest (id),
+    составленный из названий классов эквивалентности, например 'name=russian-age=min'."""
+
+    __slots__ = ('values', 'classes')
+
+    def __init__(self, values: dict, classes: dict):
+        self.values = values
+        self.classes = classes
+
+    @property
+    def id(self) -> str:
+        return '-'.join(f'{factor}={name}' for factor, name in self.classes.items())
+
+    def __getitem__(self, factor: str):
+        return self.values[factor]
+
+    def __repr__(self):
+        return f"Case({self.id})"
+
+
+def _classes(values) -> list:
+    """Функция возвращает список (название класса, значение) без повторяющихся значений: если два
+    класса эквивалентности дают одно и то же значение, остается первый."""
+
+    items = values.items() if isinstance(values, dict) else ((str(value), value) for value in values)
+    result, seen = [], set()
+    for name, value in items:
+        key = (type(value), value)
+        if key not in seen:
+            seen.add(key)
+            result.append((name, value))
+    return result
+
+
+def _pairs(case: dict, uncovered: set) -> int:
+    return sum(((a, case[a]), (b, case[b])) in uncovered for a, b in combinations(sorted(case), 2))
+
+
+def cases(factors: dict, strength: int = 2, budget: int = None, candidates: int = 20) -> list:
+    """Функция строит набор тестовых случаев по параметрам factors - словарю
+    {параметр: список значений или словарь {название класса: значение}}.
+
+    strength=2 - попарное покрытие (all-pairs): каждая пара значений любых двух параметров
+    встречается хотя бы в одном случае, а случаев обычно намного меньше, чем в полном декартовом
+    произведении. strength=1 - каждое значение каждого параметра встречается хотя бы один раз.
+    budget - максимальное количество случаев: они выбираются жадно, так чтобы каждый следующий
+    покрывал как можно больше еще не покрытых пар. Значения, повторяющиеся внутри параметра,
+    и одинаковые случаи отбрасываются. Результат детерминирован."""
+
+    if strength not in (1, 2):
+        raise ValueError('strength must be 1 or 2')
+    names = list(factors)
+    classes = {factor: _classes(factors[factor]) for factor in names}
+    if any(not values for values in classes.values()):
+        raise ValueError('Every factor needs at least one value')
+
+    if strength == 1 or len(names) < 2:
+        size = max(len(values) for values in classes.values())
+        indexes = [{factor: i % len(classes[factor]) for factor in names} for i in range(size)]
+    else:
+        uncovered = {((a, i), (b, j)) for a, b in combinations(sorted(names), 2)
+                     for i in range(len(classes[a])) for j in range(len(classes[b]))}
+        indexes = []
+        used = {factor: [0] * len(classes[factor]) for factor in names}
+        while uncovered and (budget is None or len(indexes) < budget):
+            best, best_score = None, -1
+            # Кандидаты начинаются с разных непокрытых пар (сначала - из реже использованных значений)
+            # и дополняются жадно, как в AETG.
+            seeds = sorted(uncovered, key=lambda pair: (used[pair[0][0]][pair[0][1]] + used[pair[1][0]][pair[1][1]],
+                                                        pair))
+            for (a, i), (b, j) in seeds[:candidates]:
+                case = {a: i, b: j}
+                for factor in names:
+                    if factor in case:
+                        continue
+                    case[factor] = max(range(len(classes[factor])),
+                                       key=lambda k: (_pairs(dict(case, **{factor: k}), uncovered),
+                                                      -used[factor][k], -k))
+                score = _pairs(case, uncovered)
+                if score > best_score:
+                    best, best_score = case, score
+            indexes.append(best)
+            for a, b in combinations(sorted(names), 2):
+                uncovered.discard(((a, best[a]), (b, best[b])))
+            for factor in names:
+                used[factor][best[factor]] += 1
+
+    result, seen = [], set()
+    for case in indexes[:budget]:
+        key = tuple(case[factor] for factor in names)
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(Case({factor: classes[factor][case[factor]][1] for factor in names},
+                           {factor: classes[factor][case[factor]][0] for factor in names}))
+    return result
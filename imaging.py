@@ -0,0 +1,167 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from photos import detect_content_type
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Форматы, которые PhotoProcessor по умолчанию принимает и перекодирует в JPEG. GIF не входит в список:
+# сервер не сохраняет такие фото, а анимацию нельзя перекодировать без потерь.
+DEFAULT_ACCEPTED = ('image/jpeg', 'image/png', 'image/webp', 'image/bmp')
+
+
+def _read_photo(pet_photo) -> bytes:
+    if isinstance(pet_photo, (str, os.PathLike)):
+        with open(pet_photo, 'rb') as photo:
+            return photo.read()
+    if isinstance(pet_photo, (bytes, bytearray, memoryview)):
+        return bytes(pet_photo)
+    return pet_photo.read()
+
+
+def _reencode(data: bytes, max_size: int, quality: int) -> bytes:
+    """Функция уменьшает изображение так, чтобы большая сторона не превышала max_size,
+    и кодирует его в JPEG с качеством quality. Прозрачность заменяется белым фоном.
+    Выполняется в процессе пула, поэтому объявлена на уровне модуля."""
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image.mode in ('RGBA', 'LA') or image.mode == 'P' and 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=quality, optimize=True)
+        return output.getvalue()
+
+
+class PhotoProcessor:
+    """Подготовка фото перед загрузкой (передается клиенту параметром photo_processor).
+
+    Формат проверяется по сигнатуре файла (см. photos.detect_content_type): если он не входит
+    в accepted, вызывается ValueError и запрос к серверу не отправляется. Изображение уменьшается
+    до max_size пикселей по большей стороне и перекодируется в JPEG с качеством quality в пуле из
+    workers процессов (workers=0 - в текущем процессе). Если результат получился больше исходного
+    JPEG, который уже не больше max_size, отправляется исходный файл. Результаты кэшируются по sha256
+    содержимого (не больше cache_size фото), поэтому повторная загрузка того же фото не перекодирует
+    его заново.
+    Требует Pillow."""
+
+    def __init__(self, max_size: int = 1024, quality: int = 85, accepted=DEFAULT_ACCEPTED, workers: int = None,
+                 cache_size: int = 128):
+        if Image is None:
+            raise ImportError('PhotoProcessor requires Pillow')
+        self.max_size = max_size
+        self.quality = quality
+        self.accepted = tuple(accepted)
+        self.workers = workers
+        self.cache_size = cache_size
+        self.processed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._cache = OrderedDict()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Метод останавливает пул процессов."""
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'processed': self.processed, 'cache_hits': self.cache_hits, 'bytes_in': self.bytes_in,
+                    'bytes_out': self.bytes_out, 'bytes_saved': self.bytes_in - self.bytes_out}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _cached(self, digest: str, size: int):
+        with self._lock:
+            result = self._cache.get(digest)
+            if result is not None:
+                self._cache.move_to_end(digest)
+                self.cache_hits += 1
+                self.bytes_in += size
+                self.bytes_out += len(result)
+            return result
+
+    def _fits(self, data: bytes) -> bool:
+        # Image.open читает только заголовок, поэтому размер известен без декодирования изображения.
+        with Image.open(io.BytesIO(data)) as image:
+            return max(image.size) <= self.max_size
+
+    def _store(self, digest: str, data: bytes, result: bytes) -> bytes:
+        # Исходный JPEG отправляется вместо перекодированного, только если он не больше по объему
+        # и уже укладывается в max_size.
+        if len(result) >= len(data) and detect_content_type(data[:16]) == 'image/jpeg' and self._fits(data):
+            result = data
+        with self._lock:
+            self.processed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(result)
+            self._cache[digest] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _check(self, data: bytes) -> None:
+        content_type = detect_content_type(data[:16])
+        if content_type not in self.accepted:
+            raise ValueError(f"Unsupported photo format: {content_type}")
+
+    def process(self, pet_photo) -> bytes:
+        """Метод возвращает подготовленное фото в виде bytes. pet_photo - путь к файлу,
+        bytes/bytearray/memoryview или файлоподобный объект."""
+
+        return self.process_many([pet_photo])[0]
+
+    def process_many(self, photos) -> list:
+        """Метод подготавливает несколько фото, перекодируя их параллельно в пуле процессов."""
+
+        datas = [_read_photo(photo) for photo in photos]
+        results, pending = [None] * len(datas), {}
+        for i, data in enumerate(datas):
+            self._check(data)
+            digest = hashlib.sha256(data).hexdigest()
+            results[i] = self._cached(digest, len(data))
+            if results[i] is None:
+                pending[i] = digest
+
+        if self.workers == 0:
+            encoded = {i: _reencode(datas[i], self.max_size, self.quality) for i in pending}
+        else:
+            pool = self._pool()
+            futures = {i: pool.submit(_reencode, datas[i], self.max_size, self.quality) for i in pending}
+            encoded = {i: future.result() for i, future in futures.items()}
+        for i, digest in pending.items():
+            results[i] = self._store(digest, datas[i], encoded[i])
+        return results
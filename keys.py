@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def _credentials_id(email: str, password: str) -> str:
+    # В кэше на диске хранится только хэш учетных данных, но не сам пароль.
+    return hashlib.sha256(f'{email}\0{password}'.encode()).hexdigest()
+
+
+class KeyManager:
+    """Кэш ключей авторизации (auth_key) по паре (email, пароль).
+
+    Ключ запрашивается у сервера один раз и хранится в памяти, а если задан cache_path - еще и в
+    JSON-файле на диске (файл доступен только владельцу). ttl - время жизни ключа в секундах,
+    None - ключ действует, пока сервер не ответит 403. Одновременные запросы одного ключа из
+    разных потоков (get) или задач asyncio (aget) объединяются в один запрос к серверу."""
+
+    def __init__(self, cache_path: str = None, ttl: float = None):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._keys = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._login_locks = {}
+        self._inflight = {}
+        self._disk_loaded = False
+
+    def _load_disk(self):
+        self._disk_loaded = True
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding='utf-8') as cache:
+                entries = json.load(cache)
+        except (OSError, ValueError):
+            return
+        for cred_id, entry in entries.items():
+            self._keys.setdefault(cred_id, (entry['key'], entry.get('expires')))
+
+    def _save_disk(self):
+        if not self.cache_path:
+            return
+        entries = {cred_id: {'key': key, 'expires': expires} for cred_id, (key, expires) in self._keys.items()}
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.keys-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as cache:
+            json.dump(entries, cache)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.cache_path)
+
+    def _cached(self, cred_id: str):
+        """Метод возвращает действующий ключ из кэша или None. Вызывается под self._lock."""
+
+        if not self._disk_loaded:
+            self._load_disk()
+        entry = self._keys.get(cred_id)
+        if entry is None:
+            return None
+        key, expires = entry
+        if expires is not None and expires <= time.time():
+            del self._keys[cred_id]
+            return None
+        return key
+
+    def _store(self, cred_id: str, email: str, password: str, result) -> None:
+        with self._lock:
+            expires = time.time() + self.ttl if self.ttl is not None else None
+            self._keys[cred_id] = (result['key'], expires)
+            self._owners[result['key']] = (email, password)
+            self._save_disk()
+
+    def credentials(self, key: str):
+        """Метод возвращает (email, пароль), для которых был получен ключ, или None,
+        если ключ получен не через этот менеджер."""
+
+        return self._owners.get(key)
+
+    def current(self, key: str) -> str:
+        """Метод возвращает актуальный ключ для тех же учетных данных, что и key: если ключ уже был
+        обновлен, вызывающий код со старым ключом сразу получит новый, без лишнего ответа 403."""
+
+        credentials = self._owners.get(key)
+        if credentials is None:
+            return key
+        with self._lock:
+            cached = self._cached(_credentials_id(*credentials))
+        return cached if cached is not None else key
+
+    def invalidate(self, key: str) -> None:
+        """Метод удаляет ключ из кэша, например, после ответа сервера 403."""
+
+        with self._lock:
+            for cred_id, (cached_key, _) in list(self._keys.items()):
+                if cached_key == key:
+                    del self._keys[cred_id]
+            self._save_disk()
+
+    def get(self, email: str, password: str, login) -> tuple:
+        """Метод возвращает (статус, результат) в формате get_api_key: из кэша или вызвав login(email, password).
+        В кэш попадают только успешные (статус 200) ответы."""
+
+        cred_id = _credentials_id(email, password)
+        with self._lock:
+            key = self._cached(cred_id)
+            if key is not None:
+                self._owners[key] = (email, password)
+                return 200, {'key': key}
+            login_lock = self._login_locks.setdefault(cred_id, threading.Lock())
+
+        with login_lock:
+            # Пока поток ждал, ключ мог получить другой поток.
+            with self._lock:
+                key = self._cached(cred_id)
+            if key is not None:
+                self._owners[key] = (email, password)
+                return 200, {'key': key}
+            status, result = login(email, password)
+            if status == 200 and 'key' in result:
+                self._store(cred_id, email, password, result)
+            return status, result
+
+    async def aget(self, email: str, password: str, login) -> tuple:
+        """Асинхронный вариант get: login - корутинная функция, а одновременные вызовы
+        в одном цикле событий ожидают общий запрос к серверу."""
+
+        import asyncio
+
+        cred_id = _credentials_id(email, password)
+        with self._lock:
+            key = self._cached(cred_id)
+        if key is not None:
+            self._owners[key] = (email, password)
+            return 200, {'key': key}
+
+        inflight = self._inflight.get(cred_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(login(email, password))
+            self._inflight[cred_id] = inflight
+            try:
+                status, result = await asyncio.shield(inflight)
+            finally:
+                del self._inflight[cred_id]
+            if status == 200 and 'key' in result:
+                self._store(cred_id, email, password, result)
+            return status, result
+        return await asyncio.shield(inflight)
+
+    def refresh(self, stale_key: str, login):
+        """Метод заменяет устаревший ключ новым и возвращает его (или None, если получить ключ
+        не удалось). Если другой поток уже обновил ключ, повторного запроса к серверу не будет."""
+
+        credentials = self.credentials(stale_key)
+        if credentials is None:
+            return None
+        self._drop(stale_key, *credentials)
+        status, result = self.get(*credentials, login)
+        return result['key'] if status == 200 else None
+
+    async def arefresh(self, stale_key: str, login):
+        """Асинхронный вариант refresh."""
+
+        credentials = self.credentials(stale_key)
+        if credentials is None:
+            return None
+        self._drop(stale_key, *credentials)
+        status, result = await self.aget(*credentials, login)
+        return result['key'] if status == 200 else None
+
+    def _drop(self, stale_key: str, email: str, password: str) -> None:
+        cred_id = _credentials_id(email, password)
+        with self._lock:
+            entry = self._keys.get(cred_id)
+            if entry is not None and entry[0] == stale_key:
+                del self._keys[cred_id]
+                self._save_disk()
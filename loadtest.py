@@ -0,0 +1,272 @@
+"""Нагрузочное тестирование сервера PetFriends с помощью клиента PetFriends.
+
+Запуск: python loadtest.py --rps 50 --duration 30 --mix list=5,create_simple=2,delete=1 --output run.json"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Histogram
+
+SCENARIOS = ('login', 'list', 'create_simple', 'create_with_photo', 'update', 'set_photo', 'delete')
+
+DEFAULT_MIX = {'login': 1, 'list': 8, 'create_simple': 4, 'create_with_photo': 1, 'update': 3, 'set_photo': 1,
+               'delete': 2}
+
+DEFAULT_PHOTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'images', 'Deyk.jpg')
+
+QUANTILES = (50, 90, 95, 99, 99.9)
+
+
+class _ScenarioStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.service_time = Histogram()
+        self.statuses = {}
+        self.errors = 0
+
+
+class LoadTest:
+    """Нагрузочный тест: сценарии из SCENARIOS выбираются случайно с весами из mix и выполняются
+    клиентом client от имени пользователя email/password.
+
+    run(rps=...) запускает тест с открытой моделью нагрузки: запросы стартуют по расписанию
+    (i-й - через i/rps секунд после начала) независимо от того, завершились ли предыдущие,
+    а задержка отсчитывается от запланированного времени старта. Поэтому медленные ответы
+    сервера не уменьшают нагрузку и не скрываются из статистики (coordinated omission).
+    run(concurrency=...) запускает тест с закрытой моделью: concurrency потоков выполняют
+    запросы друг за другом без пауз.
+
+    Для сценариев update, set_photo и delete используются питомцы, созданные во время теста;
+    если таких нет, вместо них выполняется create_simple."""
+
+    def __init__(self, client, email: str, password: str, mix: dict = None, photo=DEFAULT_PHOTO, seed=None):
+        mix = dict(DEFAULT_MIX if mix is None else mix)
+        unknown = set(mix) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self._client = client
+        self._email = email
+        self._password = password
+        self._names = [name for name in mix if mix[name] > 0]
+        self._weights = [mix[name] for name in self._names]
+        if not self._names:
+            raise ValueError('Scenario mix is empty')
+        # Фото читается один раз, чтобы не измерять чтение файла с диска в каждом запросе.
+        if isinstance(photo, str) and ('create_with_photo' in self._names or 'set_photo' in self._names):
+            with open(photo, 'rb') as file:
+                photo = file.read()
+        self._photo = photo
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pets = []
+        self._stats = {}
+        self._key = None
+
+    def _next_scenario(self) -> str:
+        with self._lock:
+            return self._random.choices(self._names, self._weights)[0]
+
+    def _take_pet(self):
+        # Питомец убирается из списка на время запроса, чтобы его не удалил параллельный сценарий delete.
+        with self._lock:
+            if not self._pets:
+                return None
+            index = self._random.randrange(len(self._pets))
+            self._pets[index], self._pets[-1] = self._pets[-1], self._pets[index]
+            return self._pets.pop()
+
+    def _return_pet(self, pet_id: str) -> None:
+        with self._lock:
+            self._pets.append(pet_id)
+
+    def _created(self, status: int, result) -> None:
+        if status == 200 and isinstance(result, dict) and 'id' in result:
+            with self._lock:
+                self._pets.append(result['id'])
+
+    def _execute(self, scenario: str):
+        """Метод выполняет сценарий и возвращает фактически выполненный сценарий и статус ответа."""
+
+        pf, key = self._client, self._key
+        if scenario in ('update', 'set_photo', 'delete'):
+            pet_id = self._take_pet()
+            if pet_id is None:
+                scenario = 'create_simple'
+        if scenario == 'login':
+            status, _ = pf.get_api_key(self._email, self._password)
+        elif scenario == 'list':
+            status, _ = pf.get_list_of_pets(key, 'my_pets')
+        elif scenario == 'create_simple':
+            status, result = pf.add_new_pet_simple(key, 'Load', 'cat', 1)
+            self._created(status, result)
+        elif scenario == 'create_with_photo':
+            status, result = pf.add_new_pet_with_photo(key, 'Load', 'cat', 1, self._photo)
+            self._created(status, result)
+        elif scenario == 'update':
+            try:
+                status, _ = pf.update_pet_info(key, pet_id, 'Load', 'dog', 2)
+            finally:
+                self._return_pet(pet_id)
+        elif scenario == 'set_photo':
+            try:
+                status, _ = pf.add_pet_photo(key, pet_id, self._photo)
+            finally:
+                self._return_pet(pet_id)
+        else:
+            status = pf.delete_pet(key, pet_id)
+        return scenario, status
+
+    def _run_one(self, scenario: str, scheduled: float) -> None:
+        started = time.perf_counter()
+        try:
+            scenario, status = self._execute(scenario)
+            error = False
+        except Exception:
+            status, error = 'error', True
+        finished = time.perf_counter()
+        with self._lock:
+            stats = self._stats.get(scenario)
+            if stats is None:
+                stats = self._stats[scenario] = _ScenarioStats()
+            stats.latency.record(finished - scheduled)
+            stats.service_time.record(finished - started)
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            stats.errors += error or status != 200
+
+    def _open_loop(self, rps: float, duration: float, requests: int, workers: int) -> None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            start = time.perf_counter()
+            i = 0
+            while requests is None or i < requests:
+                scheduled = start + i / rps
+                if duration is not None and scheduled - start >= duration:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._run_one, self._next_scenario(), scheduled)
+                i += 1
+
+    def _closed_loop(self, concurrency: int, duration: float, requests: int) -> None:
+        deadline = None if duration is None else time.perf_counter() + duration
+        remaining = [requests]
+
+        def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                if requests is not None:
+                    with self._lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                self._run_one(self._next_scenario(), time.perf_counter())
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run(self, rps: float = None, concurrency: int = None, duration: float = 10, requests: int = None,
+            workers: int = 64, cleanup: bool = True) -> dict:
+        """Метод выполняет тест с заданной частотой запросов rps (открытая модель) или с заданным
+        количеством одновременных запросов concurrency (закрытая модель) в течение duration секунд
+        и/или до выполнения requests запросов. workers - максимальное количество одновременных
+        запросов в открытой модели. Если cleanup=True, оставшиеся после теста питомцы удаляются.
+        Возвращает отчет (см. report)."""
+
+        if (rps is None) == (concurrency is None):
+            raise ValueError('Specify either rps or concurrency')
+        if duration is None and requests is None:
+            raise ValueError('Specify duration or requests')
+
+        status, self._key = self._client.get_key(self._email, self._password)
+        if status != 200:
+            raise RuntimeError(f'Could not get API key: {status} {self._key}')
+        self._stats = {}
+        start = time.perf_counter()
+        if rps is not None:
+            self._open_loop(rps, duration, requests, workers)
+        else:
+            self._closed_loop(concurrency, duration, requests)
+        elapsed = time.perf_counter() - start
+        if cleanup and self._pets:
+            self._client.bulk_delete(self._key, self._pets).summary()
+            self._pets = []
+        return self.report(elapsed, {'mode': 'open' if rps is not None else 'closed', 'target_rps': rps,
+                                     'concurrency': concurrency})
+
+    def report(self, elapsed: float, params: dict = None) -> dict:
+        """Метод возвращает отчет: общую пропускную способность и по каждому сценарию количество
+        запросов, пропускную способность, статусы, ошибки и перцентили задержки (latency - от
+        запланированного старта, service_time - от фактической отправки) в секундах."""
+
+        with self._lock:
+            scenarios = {name: {'requests': stats.latency.count,
+                                'throughput': stats.latency.count / elapsed if elapsed else 0.0,
+                                'statuses': dict(stats.statuses),
+                                'errors': stats.errors,
+                                'latency': stats.latency.summary(QUANTILES),
+                                'service_time': stats.service_time.summary(QUANTILES)}
+                         for name, stats in sorted(self._stats.items())}
+        total = sum(scenario['requests'] for scenario in scenarios.values())
+        return dict(params or {}, elapsed=elapsed, requests=total,
+                    throughput=total / elapsed if elapsed else 0.0,
+                    errors=sum(scenario['errors'] for scenario in scenarios.values()),
+                    scenarios=scenarios)
+
+
+def parse_mix(value: str) -> dict:
+    """Функция разбирает веса сценариев из строки вида 'list=5,create_simple=2'."""
+
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def main(argv=None):
+    from api import PetFriends
+    from settings import base_url, valid_email, valid_password
+
+    parser = argparse.ArgumentParser(description='Нагрузочное тестирование сервера PetFriends')
+    parser.add_argument('--base-url', default=base_url)
+    parser.add_argument('--email', default=valid_email)
+    parser.add_argument('--password', default=valid_password)
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument('--rps', type=float, help='частота запросов в секунду (открытая модель)')
+    load.add_argument('--concurrency', type=int, help='количество одновременных запросов (закрытая модель)')
+    parser.add_argument('--duration', type=float, default=10, help='длительность теста в секундах')
+    parser.add_argument('--requests', type=int, help='количество запросов')
+    parser.add_argument('--workers', type=int, default=64,
+                        help='максимальное количество одновременных запросов в открытой модели')
+    parser.add_argument('--mix', type=parse_mix, help=f"веса сценариев, например list=5,delete=1 "
+                                                      f"(сценарии: {', '.join(SCENARIOS)})")
+    parser.add_argument('--photo', default=DEFAULT_PHOTO)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--no-cleanup', action='store_true', help='не удалять созданных питомцев')
+    parser.add_argument('--output', help='файл для отчета в формате JSON (по умолчанию - stdout)')
+    args = parser.parse_args(argv)
+
+    pool = max(args.workers, args.concurrency or 0)
+    with PetFriends(base_url=args.base_url, pool_connections=1, pool_maxsize=pool) as client:
+        test = LoadTest(client, args.email, args.password, args.mix, args.photo, args.seed)
+        report = test.run(rps=args.rps, concurrency=args.concurrency, duration=args.duration,
+                          requests=args.requests, workers=args.workers, cleanup=not args.no_cleanup)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
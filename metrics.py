@@ -0,0 +1,182 @@
+import json
+import math
+import threading
+
+
+class RequestEvent:
+    """Событие о выполненном запросе клиента. Время указано в секундах: connect - разрешение имени
+    и установка TCP-соединения, tls - TLS-рукопожатие (оба None, если использовано соединение из
+    пула), ttfb - от отправки запроса до получения заголовков ответа, total - полное время вызова.
+    limit и queue_depth - лимит одновременных запросов и количество ожидающих запросов клиента
+    в момент завершения запроса (None, если ограничения не заданы)."""
+
+    __slots__ = ('endpoint', 'method', 'status', 'bytes_sent', 'bytes_received', 'connect', 'tls', 'ttfb',
+                 'total', 'retries', 'error', 'limit', 'queue_depth')
+
+    def __init__(self, endpoint: str, method: str, status: int = None, bytes_sent: int = 0,
+                 bytes_received: int = 0, connect: float = None, tls: float = None, ttfb: float = None,
+                 total: float = 0.0, retries: int = 0, error: str = None, limit: int = None,
+                 queue_depth: int = None):
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.connect = connect
+        self.tls = tls
+        self.ttfb = ttfb
+        self.total = total
+        self.retries = retries
+        self.error = error
+        self.limit = limit
+        self.queue_depth = queue_depth
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"RequestEvent({self.method} {self.endpoint} status={self.status} total={self.total:.4f})"
+
+
+class Histogram:
+    """Гистограмма значений с логарифмическими интервалами (в духе HdrHistogram): относительная
+    погрешность перцентилей не превышает precision, а память не зависит от количества значений."""
+
+    def __init__(self, precision: float = 0.01, lowest: float = 1e-6):
+        self._log_base = math.log1p(precision)
+        self._lowest = lowest
+        self._buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        bucket = int(math.log(max(value, self._lowest) / self._lowest) / self._log_base)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Метод возвращает значение q-го перцентиля (q от 0 до 100)."""
+
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # Верхняя граница интервала, но не больше наблюдавшегося максимума.
+                return min(self._lowest * math.exp((bucket + 1) * self._log_base), self.max)
+        return self.max
+
+    def merge(self, other: 'Histogram') -> None:
+        for bucket, count in other._buckets.items():
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self, quantiles=(50, 95, 99)) -> dict:
+        result = {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0,
+                  'min': self.min if self.count else 0.0, 'max': self.max}
+        result.update({f'p{q}': self.percentile(q) for q in quantiles})
+        return result
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.ttfb = Histogram()
+        self.statuses = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.errors = 0
+
+
+def _labels(key: str) -> str:
+    """Функция возвращает метки Prometheus method и endpoint для ключа вида 'GET api/pets'."""
+
+    method, _, endpoint = key.partition(' ')
+    return 'method="%s",endpoint="%s"' % (method, endpoint.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class MetricsRecorder:
+    """Приемник событий клиента, который собирает по каждому эндпоинту гистограммы времени ответа
+    (p50/p95/p99), счетчики статусов, переданных байт, повторов и ошибок, а также последние значения
+    лимита одновременных запросов и длины очереди клиента (gauges). Экспортирует данные в текстовом
+    формате Prometheus (to_prometheus) и в JSON (to_json). Потокобезопасен."""
+
+    def __init__(self):
+        self._stats = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent) -> None:
+        key = f'{event.method} {event.endpoint}'
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats()
+            stats.latency.record(event.total)
+            if event.ttfb is not None:
+                stats.ttfb.record(event.ttfb)
+            status = str(event.status) if event.status is not None else 'error'
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.bytes_sent += event.bytes_sent
+            stats.bytes_received += event.bytes_received
+            stats.retries += event.retries
+            stats.errors += event.error is not None
+            for gauge in ('limit', 'queue_depth'):
+                if getattr(event, gauge) is not None:
+                    self._gauges[gauge] = getattr(event, gauge)
+
+    def snapshot(self) -> dict:
+        """Метод возвращает сводку по эндпоинтам в виде словаря."""
+
+        with self._lock:
+            return {key: {'latency': stats.latency.summary(), 'ttfb': stats.ttfb.summary(),
+                          'statuses': dict(stats.statuses), 'bytes_sent': stats.bytes_sent,
+                          'bytes_received': stats.bytes_received, 'retries': stats.retries,
+                          'errors': stats.errors}
+                    for key, stats in self._stats.items()}
+
+    def gauges(self) -> dict:
+        """Метод возвращает последние значения limit и queue_depth из событий."""
+
+        with self._lock:
+            return dict(self._gauges)
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = 'petfriends') -> str:
+        lines = [f'# TYPE {prefix}_request_duration_seconds summary']
+        snapshot = self.snapshot()
+        for key, stats in snapshot.items():
+            labels = _labels(key)
+            for q in (50, 95, 99):
+                lines.append(f'{prefix}_request_duration_seconds{{{labels},quantile="{q / 100}"}} '
+                             f'{stats["latency"][f"p{q}"]:.6f}')
+            latency = stats['latency']
+            lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {latency["mean"] * latency["count"]:.6f}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {latency["count"]}')
+        lines.append(f'# TYPE {prefix}_requests_total counter')
+        for key, stats in snapshot.items():
+            labels = _labels(key)
+            for status, count in sorted(stats['statuses'].items()):
+                lines.append(f'{prefix}_requests_total{{{labels},status="{status}"}} {count}')
+        for metric in ('bytes_sent', 'bytes_received', 'retries', 'errors'):
+            lines.append(f'# TYPE {prefix}_{metric}_total counter')
+            for key, stats in snapshot.items():
+                labels = _labels(key)
+                lines.append(f'{prefix}_{metric}_total{{{labels}}} {stats[metric]}')
+        for gauge, value in sorted(self.gauges().items()):
+            lines.append(f'# TYPE {prefix}_{gauge} gauge')
+            lines.append(f'{prefix}_{gauge} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,446 @@
+"""Локальный заменитель сервера PetFriends для тестов без сети и нагрузочных прогонов.
+
+Сервер работает на asyncio в отдельном потоке текущего процесса, хранит данные в памяти и реализует
+api/key, api/pets (GET, POST), api/pets/<id> (PUT, DELETE), api/create_pet_simple и
+api/pets/set_photo/<id>. Умеет добавлять задержку и ошибки, а при emulate_bugs=True воспроизводит
+известные ошибки настоящего сервера (см. пропущенные тесты в tests/test_pet_friends.py).
+
+Запуск отдельным процессом: python mock_server.py [--port 8000] [--latency 0.01]"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from photos import detect_content_type
+from throttle import TokenBucket
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+            405: 'Method Not Allowed', 429: 'Too Many Requests', 500: 'Internal Server Error',
+            503: 'Service Unavailable'}
+_ACCEPTED_PHOTOS = ('image/jpeg', 'image/png')
+
+
+def _parse_multipart(body: bytes, content_type: str):
+    """Функция разбирает тело multipart/form-data и возвращает (поля, файлы):
+    поля - словарь строк, файлы - словарь {имя: (имя файла, bytes)}."""
+
+    boundary = None
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'boundary':
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError('multipart boundary is missing')
+
+    fields, files = {}, {}
+    for part in body.split(b'--' + boundary.encode())[1:]:
+        if part.startswith(b'--'):
+            break
+        head, _, content = part[2:].partition(b'\r\n\r\n')
+        content = content[:-2] if content.endswith(b'\r\n') else content
+        name = filename = None
+        for line in head.decode('utf-8', 'replace').split('\r\n'):
+            key, _, value = line.partition(':')
+            if key.strip().lower() != 'content-disposition':
+                continue
+            for param in value.split(';')[1:]:
+                param_name, _, param_value = param.strip().partition('=')
+                if param_name == 'name':
+                    name = param_value.strip('"')
+                elif param_name == 'filename':
+                    filename = param_value.strip('"')
+        if name is None:
+            continue
+        if filename is not None:
+            files[name] = (filename, content)
+        else:
+            fields[name] = content.decode('utf-8')
+    return fields, files
+
+
+class MockPetFriendsServer:
+    """Заменитель сервера PetFriends.
+
+    users - словарь {email: пароль} зарегистрированных пользователей. latency - задержка перед каждым
+    ответом в секундах, error_rate - доля запросов, на которые сервер отвечает 500.
+    emulate_bugs=True воспроизводит ошибки настоящего сервера: 500 вместо 400 на невалидный filter,
+    создание питомца без фото при загрузке gif и отсутствие проверки имени, типа и возраста
+    при создании питомца. При emulate_bugs=False на такие запросы сервер отвечает 400.
+    etags=True добавляет к списку питомцев заголовок ETag и отвечает 304 на запрос с If-None-Match,
+    если список не изменился. throttle - максимальная частота запросов в секунду: сверх нее сервер
+    отвечает 429 с заголовком Retry-After (в целых секундах)."""
+
+    def __init__(self, users: dict = None, host: str = '127.0.0.1', port: int = 0, latency: float = 0,
+                 error_rate: float = 0, emulate_bugs: bool = True, etags: bool = True, throttle: float = None):
+        self.users = dict(users or {})
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.emulate_bugs = emulate_bugs
+        self.etags = etags
+        # Допускаются всплески запросов за 0.1 с, как у обычных ограничителей на стороне сервера.
+        self.throttle = TokenBucket(throttle, burst=max(1.0, throttle / 10)) if throttle else None
+        self.pets = {}
+        # Версия хранилища увеличивается при каждом изменении питомцев и входит в ETag.
+        self._version = 0
+        self.requests_count = 0
+        # Количество принятых соединений и соединений, открытых в данный момент.
+        self.connections_count = 0
+        self.open_connections = 0
+        self._keys = {}
+        self._user_keys = {}
+        self._fail_next = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}/'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Метод запускает сервер в фоновом потоке и дожидается готовности к приему соединений."""
+
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='mock-petfriends', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Метод останавливает сервер и закрывает все соединения."""
+
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def serve_forever(self):
+        """Метод запускает сервер в текущем потоке (для запуска отдельным процессом)."""
+
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+    # Управление состоянием из тестов.
+
+    def add_user(self, email: str, password: str) -> None:
+        with self._lock:
+            self.users[email] = password
+
+    def add_pet(self, email: str, name: str, animal_type: str, age, pet_photo: str = '') -> dict:
+        """Метод добавляет питомца пользователю email напрямую в хранилище (без запроса к API)."""
+
+        pet = self._new_pet(self._user_id(email), name, animal_type, str(age), pet_photo)
+        with self._lock:
+            self.pets[pet['id']] = pet
+            self._version += 1
+        return pet
+
+    def rotate_keys(self) -> None:
+        """Метод делает недействительными все выданные ключи, как при истечении сессии."""
+
+        with self._lock:
+            self._keys.clear()
+            self._user_keys.clear()
+
+    def fail_next(self, count: int = 1, status: int = 500, headers: dict = None) -> None:
+        """Метод заставляет сервер ответить статусом status на следующие count запросов."""
+
+        with self._lock:
+            self._fail_next.extend([(status, headers or {})] * count)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.pets.clear()
+            self._version += 1
+            self._fail_next.clear()
+            self.requests_count = 0
+            self.connections_count = 0
+
+    # HTTP.
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with self._lock:
+            self.connections_count += 1
+            self.open_connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await self._read_body(reader, headers)
+
+                status, payload, extra_headers = await self._respond(method, target, headers, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if isinstance(payload, (dict, list)):
+                    data, content_type = json.dumps(payload, ensure_ascii=False).encode(), 'application/json'
+                else:
+                    data, content_type = str(payload).encode(), 'text/html; charset=utf-8'
+                head = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}',
+                        f'Content-Type: {content_type}',
+                        f'Content-Length: {len(data)}']
+                head += [f'{name}: {value}' for name, value in extra_headers.items()]
+                if not keep_alive:
+                    head.append('Connection: close')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            # CancelledError - соединение закрывается при остановке сервера (stop).
+            pass
+        finally:
+            writer.close()
+            with self._lock:
+                self.open_connections -= 1
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: dict) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            return b''.join(chunks)
+        length = int(headers.get('content-length', 0))
+        return await reader.readexactly(length) if length else b''
+
+    async def _respond(self, method: str, target: str, headers: dict, body: bytes):
+        with self._lock:
+            self.requests_count += 1
+            failure = self._fail_next.pop(0) if self._fail_next else None
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if failure is not None:
+            return failure[0], _REASONS.get(failure[0], ''), failure[1]
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, 'Internal Server Error', {}
+        if self.throttle is not None and not self.throttle.try_acquire():
+            return 429, 'Too Many Requests', {'Retry-After': str(math.ceil(self.throttle.delay()))}
+
+        url = urlsplit(target)
+        path = unquote(url.path).strip('/')
+        query = parse_qs(url.query, keep_blank_values=True)
+        try:
+            response = self._route(method, path, query, headers, body)
+            return response if len(response) == 3 else response + ({},)
+        except ValueError:
+            return 400, 'Bad Request', {}
+
+    def _route(self, method: str, path: str, query: dict, headers: dict, body: bytes):
+        if path == 'api/key':
+            if method != 'GET':
+                return 405, 'Method Not Allowed'
+            return self._get_key(headers)
+
+        user = self._keys.get(headers.get('auth_key'))
+        if user is None:
+            return 403, 'Forbidden'
+
+        if path == 'api/pets':
+            if method == 'GET':
+                return self._list_pets(user, query.get('filter', [''])[0], headers.get('if-none-match'))
+            if method == 'POST':
+                fields, files = self._form(headers, body)
+                return self._create_pet(user, fields, files.get('pet_photo'))
+        elif path == 'api/create_pet_simple' and method == 'POST':
+            fields, _ = self._form(headers, body)
+            return self._create_pet(user, fields, None)
+        elif path.startswith('api/pets/set_photo/') and method == 'POST':
+            _, files = self._form(headers, body)
+            return self._set_photo(user, path.rsplit('/', 1)[1], files.get('pet_photo'))
+        elif path.startswith('api/pets/') and path.count('/') == 2:
+            pet_id = path.rsplit('/', 1)[1]
+            if method == 'PUT':
+                fields, _ = self._form(headers, body)
+                return self._update_pet(user, pet_id, fields)
+            if method == 'DELETE':
+                with self._lock:
+                    pet = self.pets.get(pet_id)
+                    if pet is not None and pet['user_id'] == user:
+                        del self.pets[pet_id]
+                        self._version += 1
+                return 200, ''
+        return 404, 'Not Found'
+
+    @staticmethod
+    def _form(headers: dict, body: bytes):
+        content_type = headers.get('content-type', '')
+        if content_type.startswith('multipart/form-data'):
+            return _parse_multipart(body, content_type)
+        fields = parse_qs(body.decode('utf-8'), keep_blank_values=True)
+        return {name: values[0] for name, values in fields.items()}, {}
+
+    # Логика API.
+
+    def _get_key(self, headers: dict):
+        # requests отправляет заголовки в latin-1, поэтому не-ASCII значения восстанавливаются из байтов.
+        email = headers.get('email', '').encode('latin-1').decode('utf-8', 'replace')
+        password = headers.get('password', '').encode('latin-1').decode('utf-8', 'replace')
+        with self._lock:
+            if not email or self.users.get(email) != password:
+                return 403, 'This user wasn&#39;t found in database'
+            user = self._user_id(email)
+            key = self._user_keys.get(user)
+            if key is None:
+                key = uuid.uuid4().hex + uuid.uuid4().hex[:24]
+                self._user_keys[user] = key
+                self._keys[key] = user
+        return 200, {'key': key}
+
+    @staticmethod
+    def _user_id(email: str) -> str:
+        return hashlib.sha1(email.encode()).hexdigest()[:24]
+
+    @staticmethod
+    def _new_pet(user: str, name: str, animal_type: str, age: str, pet_photo: str) -> dict:
+        return {'id': str(uuid.uuid4()), 'name': name, 'animal_type': animal_type, 'age': age,
+                'pet_photo': pet_photo, 'created_at': f'{time.time():.3f}', 'user_id': user}
+
+    def _list_pets(self, user: str, filter: str, if_none_match: str = None):
+        if filter not in ('', 'my_pets'):
+            if self.emulate_bugs:
+                return 500, 'Internal Server Error'
+            return 400, 'Bad Request'
+        with self._lock:
+            etag = f'"{self._version}-{user if filter else "all"}"'
+            if self.etags and if_none_match == etag:
+                return 304, '', {'ETag': etag}
+            pets = [pet for pet in reversed(list(self.pets.values())) if filter == '' or pet['user_id'] == user]
+        return 200, {'pets': pets}, {'ETag': etag} if self.etags else {}
+
+    def _validate(self, fields: dict) -> bool:
+        if self.emulate_bugs:
+            return True
+        if not fields.get('name') or not fields.get('animal_type'):
+            return False
+        age = fields.get('age', '')
+        return age.isdigit() and 1 <= int(age) <= 99
+
+    @staticmethod
+    def _photo_uri(photo):
+        """Функция возвращает фото в виде data URI или None, если формат не поддерживается."""
+
+        _, content = photo
+        content_type = detect_content_type(content[:16])
+        if content_type not in _ACCEPTED_PHOTOS:
+            return None
+        return f'data:{content_type};base64,' + base64.b64encode(content).decode()
+
+    def _create_pet(self, user: str, fields: dict, photo):
+        if not self._validate(fields) or not all(name in fields for name in ('name', 'animal_type', 'age')):
+            return 400, 'Bad Request'
+        pet_photo = ''
+        if photo is not None:
+            pet_photo = self._photo_uri(photo)
+            if pet_photo is None:
+                if not self.emulate_bugs:
+                    return 400, 'Bad Request'
+                # Ошибка настоящего сервера: при загрузке gif питомец создается без фото.
+                pet_photo = ''
+        pet = self._new_pet(user, fields['name'], fields['animal_type'], fields['age'], pet_photo)
+        with self._lock:
+            self.pets[pet['id']] = pet
+            self._version += 1
+        return 200, pet
+
+    def _update_pet(self, user: str, pet_id: str, fields: dict):
+        with self._lock:
+            pet = self.pets.get(pet_id)
+            if pet is None or pet['user_id'] != user or not self._validate(fields):
+                return 400, 'Bad Request'
+            for name in ('name', 'animal_type', 'age'):
+                if name in fields:
+                    pet[name] = fields[name]
+            self._version += 1
+            return 200, dict(pet)
+
+    def _set_photo(self, user: str, pet_id: str, photo):
+        if photo is None:
+            return 400, 'Bad Request'
+        pet_photo = self._photo_uri(photo)
+        with self._lock:
+            pet = self.pets.get(pet_id)
+            if pet is None or pet['user_id'] != user or pet_photo is None:
+                return 400, 'Bad Request'
+            pet['pet_photo'] = pet_photo
+            self._version += 1
+            return 200, dict(pet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный заменитель сервера PetFriends')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0, help='задержка ответа в секундах')
+    parser.add_argument('--error-rate', type=float, default=0, help='доля ответов 500')
+    parser.add_argument('--no-bugs', action='store_true', help='не воспроизводить ошибки настоящего сервера')
+    parser.add_argument('--no-etags', action='store_true', help='не отдавать ETag для списка питомцев')
+    parser.add_argument('--throttle', type=float, help='максимальная частота запросов в секунду (сверх нее - 429)')
+    parser.add_argument('--user', action='append', default=[], metavar='EMAIL:PASSWORD',
+                        help='зарегистрированный пользователь (можно указать несколько раз)')
+    args = parser.parse_args()
+
+    users = dict(user.split(':', 1) for user in args.user)
+    if not users:
+        from settings import valid_email, valid_password
+        users = {valid_email: valid_password}
+    server = MockPetFriendsServer(users, args.host, args.port, args.latency, args.error_rate, not args.no_bugs,
+                                  not args.no_etags, args.throttle)
+    print(f'Mock PetFriends server: {server.base_url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import base64
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """Функция разбирает JSON из bytes или str. Если установлен orjson, байты ответа разбираются
+    им напрямую, без промежуточного декодирования в строку; иначе используется json из стандартной
+    библиотеки. При ошибке разбора вызывается ValueError."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_age(value):
+    """Функция приводит возраст, который API возвращает строкой, к int. Значения, не являющиеся
+    целым числом (сервер принимает, например, 'five'), возвращаются без изменений."""
+
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value
+
+
+class Pet:
+    """Данные питомца. Возраст хранится в виде int (см. parse_age), а фото - в исходном виде
+    (data URI в base64) и декодируется только при обращении к атрибуту photo."""
+
+    __slots__ = ('id', 'name', 'animal_type', 'age', 'created_at', 'user_id', 'pet_photo')
+
+    def __init__(self, id: str, name: str, animal_type: str, age, created_at: str = None, user_id: str = None,
+                 pet_photo: str = None):
+        self.id = id
+        self.name = name
+        self.animal_type = animal_type
+        self.age = parse_age(age)
+        self.created_at = created_at
+        self.user_id = user_id
+        self.pet_photo = pet_photo or None
+
+    @classmethod
+    def from_dict(cls, pet: dict, with_photo: bool = True) -> 'Pet':
+        return cls(pet.get('id'), pet.get('name'), pet.get('animal_type'), pet.get('age'),
+                   pet.get('created_at'), pet.get('user_id'), pet.get('pet_photo') if with_photo else None)
+
+    @classmethod
+    def coerce(cls, pet, with_photo: bool = True) -> 'Pet':
+        """Метод возвращает Pet для словаря из ответа API или для уже созданного Pet."""
+
+        if isinstance(pet, cls):
+            if with_photo or pet.pet_photo is None:
+                return pet
+            return cls(pet.id, pet.name, pet.animal_type, pet.age, pet.created_at, pet.user_id)
+        return cls.from_dict(pet, with_photo)
+
+    @property
+    def photo_content_type(self):
+        if not self.pet_photo or not self.pet_photo.startswith('data:'):
+            return None
+        return self.pet_photo[5:].split(';', 1)[0]
+
+    @property
+    def photo(self):
+        """Фото в виде bytes (или None). Декодируется при каждом обращении и не хранится в объекте."""
+
+        if not self.pet_photo:
+            return None
+        _, _, encoded = self.pet_photo.partition('base64,')
+        return base64.b64decode(encoded)
+
+    def as_dict(self) -> dict:
+        """Метод возвращает словарь в формате ответа API (возраст - строкой)."""
+
+        return {'id': self.id, 'name': self.name, 'animal_type': self.animal_type, 'age': str(self.age),
+                'created_at': self.created_at, 'user_id': self.user_id, 'pet_photo': self.pet_photo or ''}
+
+    def __getitem__(self, key: str):
+        # Доступ по ключу оставлен для совместимости с кодом, работающим со словарями из ответа API.
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Pet):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        # Хэш зависит только от id, поэтому питомцев можно хранить в множествах и ключах словарей
+        # (равные питомцы всегда имеют одинаковый id), но id после этого менять нельзя.
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Pet(id={self.id!r}, name={self.name!r}, animal_type={self.animal_type!r}, age={self.age!r})"
+
+
+class PetList:
+    """Список питомцев из ответа GET api/pets."""
+
+    __slots__ = ('pets',)
+
+    def __init__(self, pets: list):
+        self.pets = pets
+
+    @classmethod
+    def from_json(cls, data, with_photo: bool = True) -> 'PetList':
+        """Метод создает список из тела ответа (bytes или str)."""
+
+        return cls.from_dict(loads(data), with_photo)
+
+    @classmethod
+    def from_dict(cls, result: dict, with_photo: bool = True) -> 'PetList':
+        return cls([Pet.from_dict(pet, with_photo) for pet in result['pets']])
+
+    def __len__(self) -> int:
+        return len(self.pets)
+
+    def __iter__(self):
+        return iter(self.pets)
+
+    def __getitem__(self, item):
+        # result['pets'] оставлен для совместимости с кодом, работающим со словарем из ответа API.
+        if item == 'pets':
+            return self.pets
+        return self.pets[item]
+
+    def __contains__(self, pet_id) -> bool:
+        return any(pet.id == pet_id for pet in self.pets)
+
+    def find(self, pet_id: str):
+        for pet in self.pets:
+            if pet.id == pet_id:
+                return pet
+        return None
+
+    def __repr__(self):
+        return f"PetList({len(self.pets)} pets)"
@@ -0,0 +1,172 @@
+import codecs
+import json
+import re
+import threading
+
+from models import Pet
+
+_ARRAY_START = re.compile(r'"pets"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(chunks, key: str = 'pets'):
+    """Генератор инкрементально разбирает JSON-объект вида {"<key>": [...]}, поступающий частями
+    (bytes), и возвращает элементы массива по одному. В памяти одновременно находится только
+    текущий элемент и непрочитанный остаток очередной части, а не весь ответ."""
+
+    array_start = _ARRAY_START if key == 'pets' else re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+
+    def feed() -> bool:
+        # Разобранная часть буфера отбрасывается только здесь, при добавлении новой части, а не после
+        # каждого элемента: иначе остаток части копировался бы на каждом элементе.
+        nonlocal buffer, pos, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[pos:] + decoder.decode(chunk)
+                pos = 0
+                return True
+        buffer = buffer[pos:] + decoder.decode(b'', final=True)
+        pos = 0
+        exhausted = True
+        return False
+
+    # Ищем начало массива; хвост буфера сохраняется на случай, если ключ разрезан между частями.
+    while True:
+        match = array_start.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        pos = max(0, len(buffer) - len(key) - 16)
+        if not feed():
+            return
+
+    while True:
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or not feed():
+                break
+        if pos >= len(buffer):
+            raise ValueError('Unexpected end of JSON array')
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Элемент еще не получен целиком - дочитываем следующую часть.
+            if exhausted:
+                raise
+            feed()
+            continue
+        yield item
+        pos = end
+
+
+class PetIndex:
+    """Локальный индекс питомцев (Pet без фото) по id, имени и типу животного для ключа get_key
+    и фильтра filter.
+
+    refresh() потоково перечитывает список через client.iter_pets и применяет к индексу только
+    отличия. Кроме того, индекс подписывается на успешные изменения, сделанные через тот же клиент
+    (создание, обновление, добавление фото, удаление), и обновляет себя без повторного запроса
+    списка: например, после delete_pet проверка pet_id in index сразу вернет False."""
+
+    def __init__(self, client, get_key: dict, filter: str = 'my_pets'):
+        self._client = client
+        self._get_key = get_key
+        self._filter = filter
+        self._by_id = {}
+        self._by_name = {}
+        self._by_type = {}
+        self._lock = threading.Lock()
+        client.add_write_listener(self._on_write)
+
+    def close(self):
+        """Метод отписывает индекс от изменений клиента."""
+
+        self._client.remove_write_listener(self._on_write)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, pet_id: str) -> bool:
+        return pet_id in self._by_id
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def get(self, pet_id: str):
+        return self._by_id.get(pet_id)
+
+    def find(self, name: str = None, animal_type: str = None) -> list:
+        """Метод возвращает записи с указанными именем и/или типом животного."""
+
+        with self._lock:
+            ids = None
+            if name is not None:
+                ids = set(self._by_name.get(name, ()))
+            if animal_type is not None:
+                by_type = self._by_type.get(animal_type, set())
+                ids = set(by_type) if ids is None else ids & by_type
+            if ids is None:
+                ids = self._by_id.keys()
+            return [self._by_id[pet_id] for pet_id in ids]
+
+    def _put(self, record) -> None:
+        old = self._by_id.get(record.id)
+        if old is not None:
+            self._unlink(old)
+        self._by_id[record.id] = record
+        self._by_name.setdefault(record.name, set()).add(record.id)
+        self._by_type.setdefault(record.animal_type, set()).add(record.id)
+
+    def _unlink(self, record) -> None:
+        for index, value in ((self._by_name, record.name), (self._by_type, record.animal_type)):
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(record.id)
+                if not ids:
+                    del index[value]
+
+    def put(self, record) -> None:
+        with self._lock:
+            self._put(record)
+
+    def discard(self, pet_id: str) -> None:
+        with self._lock:
+            record = self._by_id.pop(pet_id, None)
+            if record is not None:
+                self._unlink(record)
+
+    def refresh(self) -> dict:
+        """Метод перечитывает список питомцев потоком и применяет изменения к индексу.
+        Возвращает словарь со списками id добавленных, удаленных и измененных питомцев."""
+
+        added, changed, seen = [], [], set()
+        for record in self._client.iter_pets(self._get_key, self._filter):
+            seen.add(record.id)
+            with self._lock:
+                old = self._by_id.get(record.id)
+                if old == record:
+                    continue
+                (added if old is None else changed).append(record.id)
+                self._put(record)
+        with self._lock:
+            removed = [pet_id for pet_id in self._by_id if pet_id not in seen]
+        for pet_id in removed:
+            self.discard(pet_id)
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+    def _on_write(self, operation: str, get_key: dict, pet_id: str, result) -> None:
+        keys = self._client.keys
+        if self._filter == 'my_pets' and keys.current(get_key['key']) != keys.current(self._get_key['key']):
+            return
+        if operation == 'delete':
+            self.discard(pet_id)
+        elif isinstance(result, Pet) or isinstance(result, dict) and 'id' in result:
+            self.put(Pet.coerce(result, with_photo=False))
@@ -0,0 +1,137 @@
+import io
+import mimetypes
+import os
+from contextlib import contextmanager
+
+# Сигнатуры (magic bytes) форматов изображений, по которым определяется настоящий тип файла.
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+_HEADER_SIZE = 16
+
+
+def detect_content_type(header: bytes, filename: str = None) -> str:
+    """Функция определяет тип изображения по первым байтам файла. Если сигнатура не распознана,
+    тип угадывается по расширению имени файла, а при неудаче возвращается application/octet-stream."""
+
+    for signature, content_type in _SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if filename:
+        guessed, _ = mimetypes.guess_type(filename)
+        if guessed:
+            return guessed
+    return 'application/octet-stream'
+
+
+class _BufferReader(io.RawIOBase):
+    """Файлоподобная обертка над bytes/bytearray/memoryview, которая отдает данные частями без
+    копирования всего буфера. Атрибут len (полный размер) вместе с tell() нужен MultipartEncoder
+    для расчета Content-Length."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    @property
+    def len(self) -> int:
+        return len(self._view)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, min(base + offset, len(self._view)))
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._pos)
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+
+class _StreamReader(io.RawIOBase):
+    """Обертка над файлоподобным объектом без настоящего fileno(), сообщающая MultipartEncoder
+    полный размер потока."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        start = stream.tell()
+        self._end = stream.seek(0, io.SEEK_END)
+        stream.seek(start)
+
+    @property
+    def len(self) -> int:
+        return self._end
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._stream.seek(offset, whence)
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def open_photo(pet_photo):
+    """Контекстный менеджер готовит фото к потоковой отправке и возвращает кортеж
+    (имя файла, файлоподобный объект, тип содержимого). pet_photo может быть путем к файлу,
+    bytes/bytearray/memoryview или открытым файлоподобным объектом. Файл, открытый по пути,
+    гарантированно закрывается при выходе из блока; переданные извне объекты не закрываются."""
+
+    if isinstance(pet_photo, (str, os.PathLike)):
+        filename = os.path.basename(pet_photo)
+        with open(pet_photo, 'rb') as photo:
+            header = photo.read(_HEADER_SIZE)
+            photo.seek(0)
+            yield filename, photo, detect_content_type(header, filename)
+        return
+
+    if isinstance(pet_photo, (bytes, bytearray, memoryview)):
+        reader = _BufferReader(pet_photo)
+        content_type = detect_content_type(reader._view[:_HEADER_SIZE].tobytes())
+        yield 'pet_photo' + (mimetypes.guess_extension(content_type) or ''), reader, content_type
+        return
+
+    filename = os.path.basename(getattr(pet_photo, 'name', None) or 'pet_photo')
+    if pet_photo.seekable():
+        start = pet_photo.tell()
+        header = pet_photo.read(_HEADER_SIZE)
+        pet_photo.seek(start)
+        content_type = detect_content_type(header, filename)
+        try:
+            pet_photo.fileno()
+            stream = pet_photo
+        except (AttributeError, OSError):
+            stream = _StreamReader(pet_photo)
+    else:
+        # Поток без произвольного доступа нельзя ни просмотреть заранее, ни измерить, поэтому
+        # он читается в память целиком.
+        data = pet_photo.read()
+        content_type = detect_content_type(data[:_HEADER_SIZE], filename)
+        stream = _BufferReader(data)
+    yield filename, stream, content_type
@@ -1,8 +1,63 @@
 import os
+from functools import lru_cache
 
-from dotenv import load_dotenv
+# Параметры и значения по умолчанию. Значение берется из аргумента Settings, затем из переменной
+# окружения с тем же именем, затем из файла .env.
+_DEFAULTS = {
+    'valid_email': None,
+    'valid_password': None,
+    'base_url': 'https://petfriends.skillfactory.ru/',
+}
 
-load_dotenv()
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
 
-valid_email = os.getenv('valid_email')
-valid_password = os.getenv('valid_password')
+
+class Settings:
+    """Настройки тестов: учетные данные (valid_email, valid_password) и адрес сервера (base_url).
+
+    Явно переданные аргументы имеют приоритет над переменными окружения, а переменные окружения -
+    над файлом env_file. Файл читается (и python-dotenv импортируется) только если какого-то
+    значения нет ни в аргументах, ни в окружении; os.environ при этом не изменяется."""
+
+    __slots__ = tuple(_DEFAULTS)
+
+    def __init__(self, env_file: str = ENV_FILE, **values):
+        unknown = set(values) - set(_DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        file_values = None
+        for name, default in _DEFAULTS.items():
+            value = values.get(name)
+            if value is None:
+                value = os.environ.get(name)
+            if value is None and env_file:
+                if file_values is None:
+                    file_values = _read_env_file(env_file)
+                value = file_values.get(name)
+            setattr(self, name, default if value is None else value)
+
+    def __repr__(self):
+        return f"Settings(valid_email={self.valid_email!r}, base_url={self.base_url!r})"
+
+
+def _read_env_file(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    from dotenv import dotenv_values
+
+    return dotenv_values(path)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Функция возвращает настройки из окружения и .env. Они читаются при первом вызове и кэшируются;
+    get_settings.cache_clear() сбрасывает кэш."""
+
+    return Settings()
+
+
+def __getattr__(name):
+    # from settings import valid_email читает настройки при первом обращении, а не при импорте модуля.
+    if name in _DEFAULTS:
+        return getattr(get_settings(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,139 @@
+import os
+import re
+import tempfile
+
+import pytest
+
+from api import PetFriends
+from cassette import Cassette
+from mock_server import MockPetFriendsServer
+from settings import base_url, valid_email, valid_password
+from tests.test_pet_friends import VALID_STRINGS
+
+# Имена питомцев, которых создают тесты и нагрузочный прогон (loadtest.py): Deyk, Load, Vasiliy <процесс xdist>,
+# строки классов эквивалентности VALID_STRINGS (имена сгенерированных наборов VALID_PETS), а также пустое
+# имя из тестов невалидных данных.
+CLEANUP_NAMES = '|'.join([r'Deyk', r'Load', r'Vasiliy (master|gw\d+)', *map(re.escape, VALID_STRINGS.values()), ''])
+
+
+def pytest_addoption(parser):
+    parser.addoption('--mock-server', action='store_true',
+                     help='запускать тесты на локальном заменителе сервера PetFriends (mock_server.py)')
+    parser.addoption('--mock-latency', type=float, default=0,
+                     help='задержка ответа локального заменителя сервера в секундах')
+    parser.addoption('--record', metavar='PATH',
+                     help='записать запросы клиента и ответы сервера в кассету PATH (JSONL)')
+    parser.addoption('--replay', metavar='PATH',
+                     help='воспроизводить ответы сервера из кассеты PATH без обращения к серверу')
+    parser.addoption('--cleanup', metavar='REGEX', nargs='?', const=CLEANUP_NAMES,
+                     help='в конце сессии удалить питомцев пользователя с именем, подходящим под REGEX '
+                          '(по умолчанию - имена, которые создают тесты)')
+    parser.addoption('--cleanup-checkpoint', metavar='PATH',
+                     default=os.path.join(tempfile.gettempdir(), 'petfriends_cleanup.jsonl'),
+                     help='файл, по которому прерванная очистка продолжается при следующем запуске')
+
+
+def pytest_configure(config):
+    record, replay = config.getoption('--record'), config.getoption('--replay')
+    if record and replay:
+        raise pytest.UsageError('--record и --replay нельзя использовать вместе')
+    # Повторяющиеся запросы воспроизводятся в порядке записи, а имя питомца из фикстуры pet содержит
+    # имя процесса, поэтому кассету можно записывать и воспроизводить только без -n.
+    if (record or replay) and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError('--record и --replay нельзя использовать при параллельном запуске (-n)')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """С опцией --cleanup после всех тестов удаляет накопившихся в аккаунте тестовых питомцев (см. cleanup.py).
+    Очистка выполняется один раз в главном процессе (при запуске с -n - после завершения всех процессов xdist)
+    и только для настоящего сервера: данные заменителя сервера удаляются вместе с ним."""
+
+    config = session.config
+    pattern = config.getoption('--cleanup')
+    if pattern is None or hasattr(config, 'workerinput') or config.getoption('--mock-server') \
+            or config.getoption('--replay'):
+        return
+    with PetFriends(base_url=base_url) as client:
+        status, key = client.get_key(valid_email, valid_password)
+        if status != 200:
+            return
+        summary = client.cleanup_pets(key, name=pattern,
+                                      checkpoint=config.getoption('--cleanup-checkpoint')).run()
+    reporter = config.pluginmanager.get_plugin('terminalreporter')
+    if reporter is not None:
+        reporter.write_line(f'cleanup: {summary}')
+
+
+@pytest.fixture(scope="session")
+def worker():
+    """Фикстура возвращает имя процесса pytest-xdist (gw0, gw1, ...) или master при запуске без -n.
+    Каждый процесс выполняет сессионные фикстуры отдельно: у него свой клиент, свой ключ
+    и (с опцией --mock-server) свой заменитель сервера."""
+
+    return os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
+
+@pytest.fixture(scope="session")
+def mock_server(request):
+    """Фикстура запускает локальный заменитель сервера PetFriends с пользователем из settings.py
+    и одним его питомцем на время тестовой сессии."""
+
+    with MockPetFriendsServer(users={valid_email: valid_password},
+                              latency=request.config.getoption('--mock-latency')) as server:
+        server.add_pet(valid_email, 'Vasiliy', 'cat', 2)
+        yield server
+
+
+@pytest.fixture(scope="session")
+def pf(request):
+    """Фикстура возвращает клиент PetFriends. С опцией --mock-server клиент работает с локальным
+    заменителем сервера, иначе - с сервером из settings.base_url. С опцией --record запросы
+    и ответы записываются в кассету, с опцией --replay ответы берутся из кассеты."""
+
+    record, replay = request.config.getoption('--record'), request.config.getoption('--replay')
+    cassette = Cassette(record, 'record') if record else Cassette(replay, 'replay') if replay else None
+
+    if request.config.getoption('--mock-server') and not replay:
+        url = request.getfixturevalue('mock_server').base_url
+    else:
+        url = base_url
+    with PetFriends(base_url=url, cassette=cassette) as client:
+        yield client
+    if cassette is not None:
+        cassette.close()
+
+
+@pytest.fixture(scope="session")
+def get_key(pf, email=valid_email, password=valid_password):
+    """Фикстура проверяет, что запрос API ключа возвращает статус 200 и в результате содержится слово key,
+    и возвращает API ключ. Ключ запрашивается один раз на процесс (при запуске с -n - один раз
+    на каждый процесс pytest-xdist)."""
+
+    #  Получаем ключ и сохраняем полученный ответ с кодом статуса в status, а текст ответа в pytest.key.
+    status, pytest.key = pf.get_key(email, password)
+    assert status == 200, 'Запрос выполнен неуспешно'
+    assert 'key' in pytest.key, 'В запросе не передан ключ авторизации'
+    return pytest.key
+
+
+@pytest.fixture(scope="session")
+def created_pets(pf, get_key):
+    """Фикстура возвращает список, в который тесты процесса добавляют id созданных ими питомцев.
+    В конце сессии питомцы из списка удаляются одним пакетом (bulk_delete), а не после каждого теста."""
+
+    pet_ids = []
+    yield pet_ids
+    if pet_ids:
+        pf.bulk_delete(get_key, pet_ids).summary()
+
+
+@pytest.fixture()
+def pet(pf, get_key, created_pets, worker):
+    """Фикстура создает питомца, принадлежащего только текущему тесту (удаляется в конце сессии).
+    Тесты изменения и удаления работают с ним, а не с первым питомцем из общего списка,
+    поэтому их можно выполнять параллельно."""
+
+    status, result = pf.add_new_pet_simple(get_key, f'Vasiliy {worker}', 'cat', 2)
+    assert status == 200, 'Не удалось создать питомца для теста'
+    created_pets.append(result['id'])
+    return result
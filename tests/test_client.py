@@ -0,0 +1,803 @@
+from api import PetFriends
+from async_api import AsyncPetFriends
+from benchmarks.bench_import import import_time
+from cache import ResponseCache
+from cassette import Cassette
+from cleanup import Cleanup
+from datagen import cases
+from imaging import PhotoProcessor
+from metrics import Histogram, MetricsRecorder
+from loadtest import LoadTest
+from mock_server import MockPetFriendsServer
+from models import Pet, PetList
+from pets import iter_json_array
+from photos import open_photo
+from PIL import Image
+from settings import Settings, valid_email, valid_password
+from tests.conftest import CLEANUP_NAMES
+from tests.test_pet_friends import VALID_PETS
+from throttle import AdaptiveLimiter, TokenBucket
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import io
+import itertools
+import json
+import os
+import pytest
+import requests
+import time
+
+
+@pytest.fixture()
+def client(mock_server):
+    """Фикстура возвращает клиент, работающий с локальным заменителем сервера, и ключ пользователя."""
+
+    with PetFriends(base_url=mock_server.base_url) as client:
+        _, key = client.get_key(valid_email, valid_password)
+        yield client, key
+
+
+def wait_for(condition, timeout: float = 2) -> bool:
+    """Функция ждет, пока condition() не вернет истину, и возвращает False, если время истекло."""
+
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestSession:
+    @pytest.mark.api
+    def test_connection_is_reused_across_requests(self, mock_server):
+        """Проверяем, что все запросы клиента идут через одно keep-alive соединение из пула."""
+        connections_count = mock_server.connections_count
+        with PetFriends(base_url=mock_server.base_url) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+            for _ in range(5):
+                assert pf.get_list_of_pets(key, 'my_pets')[0] == 200
+            assert pf.delete_pet(key, pet['id']) == 200
+
+        assert mock_server.connections_count == connections_count + 1
+
+    @pytest.mark.api
+    def test_idempotent_requests_are_retried_with_backoff(self, mock_server):
+        """Проверяем, что GET, PUT и DELETE после ответов 503 повторяются с экспоненциальной задержкой,
+        а POST не повторяется."""
+        with PetFriends(base_url=mock_server.base_url, retries=3, backoff_factor=0.1) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+            calls = [lambda: pf.get_list_of_pets(key, 'my_pets')[0],
+                     lambda: pf.update_pet_info(key, pet['id'], 'Deyk', 'dog', 4)[0],
+                     lambda: pf.delete_pet(key, pet['id'])]
+
+            for call in calls:
+                requests_count = mock_server.requests_count
+                mock_server.fail_next(2, 503)
+                start = time.perf_counter()
+                assert call() == 200
+                # Первый повтор выполняется сразу, второй - через backoff_factor * 2 секунд.
+                assert time.perf_counter() - start >= 0.2
+                assert mock_server.requests_count == requests_count + 3
+
+            requests_count = mock_server.requests_count
+            mock_server.fail_next(1, 503)
+            assert pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)[0] == 503
+            assert mock_server.requests_count == requests_count + 1
+
+    @pytest.mark.api
+    def test_default_timeout_is_applied(self):
+        """Проверяем, что запрос без явного таймаута прерывается по read_timeout клиента."""
+        with MockPetFriendsServer(users={valid_email: valid_password}) as server, \
+                PetFriends(base_url=server.base_url, read_timeout=0.2) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            server.latency = 1
+
+            start = time.perf_counter()
+            with pytest.raises(requests.Timeout):
+                pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+            assert time.perf_counter() - start < 0.9
+
+    @pytest.mark.api
+    def test_close_and_context_manager_release_pool(self, mock_server):
+        """Проверяем, что close() и выход из контекстного менеджера закрывают соединения пула,
+        а close() клиента без запросов не создает сессию."""
+        open_connections = mock_server.open_connections
+        with PetFriends(base_url=mock_server.base_url) as pf:
+            pf.get_key(valid_email, valid_password)
+            assert mock_server.open_connections == open_connections + 1
+        assert wait_for(lambda: mock_server.open_connections == open_connections)
+
+        pf = PetFriends(base_url=mock_server.base_url)
+        pf.get_key(valid_email, valid_password)
+        assert mock_server.open_connections == open_connections + 1
+        pf.close()
+        assert wait_for(lambda: mock_server.open_connections == open_connections)
+
+        unused = PetFriends(base_url=mock_server.base_url)
+        unused.close()
+        assert unused._session is None
+
+
+class TestMockServer:
+    @pytest.mark.api
+    def test_mock_server_reproduces_known_bugs(self, client):
+        """Проверяем, что заменитель сервера воспроизводит ошибки настоящего: 500 на невалидный filter
+        и создание питомца без фото при загрузке gif."""
+        pf, key = client
+        gif = os.path.join(os.path.dirname(__file__), 'images/Deyk.gif')
+
+        status, _ = pf.get_list_of_pets(key, 'invalid')
+        assert status == 500
+
+        status, result = pf.add_new_pet_with_photo(key, 'Deyk', 'dog', 3, gif)
+        assert status == 200
+        assert result['pet_photo'] == ''
+
+    @pytest.mark.api
+    def test_mock_server_without_bugs_validates_input(self):
+        """Проверяем, что при emulate_bugs=False заменитель сервера отвечает 400 на невалидные данные."""
+        with MockPetFriendsServer(users={valid_email: valid_password}, emulate_bugs=False) as server:
+            with PetFriends(base_url=server.base_url) as pf:
+                _, key = pf.get_key(valid_email, valid_password)
+
+                assert pf.get_list_of_pets(key, 'invalid')[0] == 400
+                assert pf.add_new_pet_simple(key, 'Deyk', 'dog', 'five')[0] == 400
+                assert pf.add_new_pet_simple(key, '', 'dog', 3)[0] == 400
+
+
+class TestPets:
+    @pytest.mark.api
+    def test_pet_index_follows_client_writes(self, client):
+        """Проверяем, что локальный индекс обновляется после создания и удаления питомца через клиент
+        без повторного запроса списка."""
+        pf, key = client
+        index = pf.pet_index(key, 'my_pets')
+
+        _, pet = pf.add_new_pet_simple(key, 'Indexed', 'cat', 2)
+        assert pet['id'] in index
+        assert [p.id for p in index.find(name='Indexed')] == [pet['id']]
+
+        pf.delete_pet(key, pet['id'])
+        assert pet['id'] not in index
+        assert index.refresh() == {'added': [], 'removed': [], 'changed': []}
+        index.close()
+
+    @pytest.mark.api
+    def test_iter_pets_matches_get_list_of_pets(self, client):
+        """Проверяем, что потоковый разбор списка питомцев возвращает тех же питомцев, что и get_list_of_pets."""
+        pf, key = client
+
+        _, my_pets = pf.get_list_of_pets(key, 'my_pets')
+
+        assert [pet.id for pet in pf.iter_pets(key, 'my_pets', chunk_size=7)] == [pet['id'] for pet in my_pets['pets']]
+
+    def test_iter_json_array_handles_any_chunking(self):
+        """Проверяем, что потоковый разбор не зависит от того, как ответ разбит на части,
+        в том числе посреди ключа и многобайтового символа."""
+        pets = [{'id': str(i), 'name': 'Васька "кот"', 'animal_type': 'cat', 'age': str(i)} for i in range(5)]
+        payload = json.dumps({'pets': pets}, ensure_ascii=False).encode()
+
+        for size in (1, 2, 3, 7, len(payload)):
+            chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+            assert list(iter_json_array(chunks)) == pets
+        assert list(iter_json_array([b'{"pets": []}'])) == []
+
+    @pytest.mark.api
+    def test_iter_pets_raises_on_error_status(self, client):
+        """Проверяем, что при неуспешном ответе сервера iter_pets вызывает HTTPError."""
+        pf, key = client
+
+        with pytest.raises(requests.HTTPError):
+            list(pf.iter_pets(key, 'invalid'))
+
+    @pytest.mark.api
+    def test_pet_index_refresh_applies_external_changes(self, client, mock_server):
+        """Проверяем, что refresh находит питомцев, добавленных, измененных и удаленных в обход клиента."""
+        pf, key = client
+        index = pf.pet_index(key, 'my_pets')
+        _, changed = pf.add_new_pet_simple(key, 'Indexed', 'cat', 2)
+        _, removed = pf.add_new_pet_simple(key, 'Indexed', 'cat', 3)
+        index.close()
+
+        added = mock_server.add_pet(valid_email, 'External', 'dog', 1)
+        pf.update_pet_info(key, changed['id'], 'Renamed', 'cat', 2)
+        pf.delete_pet(key, removed['id'])
+
+        assert index.refresh() == {'added': [added['id']], 'removed': [removed['id']], 'changed': [changed['id']]}
+        assert [pet.id for pet in index.find(name='Renamed')] == [changed['id']]
+
+
+class TestModels:
+    @pytest.mark.api
+    def test_client_returns_models(self, mock_server):
+        """Проверяем, что клиент с models=True возвращает Pet и PetList с возрастом в виде int,
+        совместимые с доступом по ключу, а тело ответа не в формате JSON возвращает текстом."""
+        photo = os.path.join(os.path.dirname(__file__), 'images/Deyk.jpg')
+        with PetFriends(base_url=mock_server.base_url, models=True) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+
+            status, pet = pf.add_new_pet_with_photo(key, 'Deyk', 'dog', '3', photo)
+            assert status == 200 and isinstance(pet, Pet)
+            assert pet.age == 3 and pet['name'] == 'Deyk'
+
+            status, pets = pf.get_list_of_pets(key, 'my_pets')
+            assert status == 200 and isinstance(pets, PetList)
+            assert pets['pets'][0] == pets[0] == pets.find(pet.id) == pet
+            assert pet.id in pets
+
+            status, result = pf.update_pet_info(key, 'missing', 'Deyk', 'dog', 3)
+            assert (status, result) == (400, 'Bad Request')
+            pf.delete_pet(key, pet.id)
+
+    def test_photo_is_decoded_lazily_and_pets_are_hashable(self):
+        """Проверяем, что фото хранится в исходном виде и декодируется при обращении, нецелый возраст
+        сохраняется как есть, а питомцев можно хранить в множестве."""
+        with open(os.path.join(os.path.dirname(__file__), 'images/Deyk.jpg'), 'rb') as file:
+            data = file.read()
+        uri = 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+        payload = json.dumps({'pets': [{'id': '1', 'name': 'Deyk', 'animal_type': 'dog', 'age': 'five',
+                                        'pet_photo': uri}]})
+
+        pet = PetList.from_json(payload)[0]
+        assert pet.pet_photo == uri and pet.photo == data and pet.photo_content_type == 'image/jpeg'
+        assert pet.age == 'five'
+        assert PetList.from_json(payload, with_photo=False)[0].photo is None
+        assert pet.as_dict()['pet_photo'] == uri
+        assert len({pet, Pet.from_dict(pet.as_dict()), Pet('2', 'Deyk', 'dog', 1)}) == 2
+
+
+class TestMetrics:
+    @pytest.mark.api
+    def test_client_emits_event_for_every_request(self, mock_server):
+        """Проверяем, что клиент передает приемнику metrics событие о каждом запросе с эндпоинтом
+        без id питомца, статусом, размерами и временем."""
+        events = []
+        with PetFriends(base_url=mock_server.base_url, metrics=events.append) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+            pf.delete_pet(key, pet['id'])
+
+        assert [(e.method, e.endpoint, e.status) for e in events] == [
+            ('GET', 'api/key', 200), ('POST', 'api/create_pet_simple', 200), ('DELETE', 'api/pets/{id}', 200)]
+        # Первый запрос открывает соединение, следующие используют соединение из пула.
+        assert events[0].connect is not None and events[1].connect is None
+        assert all(e.bytes_received > 0 and e.total >= e.ttfb > 0 and e.error is None for e in events[:2])
+        assert events[1].bytes_sent > 0
+
+    def test_histogram_percentiles_are_within_precision(self):
+        """Проверяем, что перцентили гистограммы отличаются от точных не больше чем на precision."""
+        histogram, other = Histogram(precision=0.01), Histogram(precision=0.01)
+        for value in range(1, 1001):
+            (histogram if value % 2 else other).record(value / 1000)
+        histogram.merge(other)
+
+        assert histogram.count == 1000 and histogram.max == 1.0 and histogram.min == 0.001
+        for q in (50, 95, 99):
+            assert histogram.percentile(q) == pytest.approx(q / 100, rel=0.01)
+        assert histogram.percentile(100) == 1.0
+        assert Histogram().percentile(99) == 0.0
+
+    @pytest.mark.api
+    def test_recorder_exports_json_and_prometheus(self, mock_server):
+        """Проверяем экспорт в JSON и в формат Prometheus с отдельными метками method и endpoint."""
+        recorder = MetricsRecorder()
+        with PetFriends(base_url=mock_server.base_url, metrics=recorder) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            for _ in range(3):
+                pf.get_list_of_pets(key, 'my_pets')
+            pf.get_list_of_pets(key, 'invalid')
+
+        snapshot = json.loads(recorder.to_json())
+        assert snapshot['GET api/pets']['statuses'] == {'200': 3, '500': 1}
+        assert snapshot['GET api/pets']['latency']['count'] == 4
+
+        text = recorder.to_prometheus()
+        assert 'petfriends_requests_total{method="GET",endpoint="api/pets",status="200"} 3' in text
+        assert 'petfriends_request_duration_seconds_count{method="GET",endpoint="api/key"} 1' in text
+        assert 'petfriends_request_duration_seconds{method="GET",endpoint="api/pets",quantile="0.99"}' in text
+
+
+class TestLoadTest:
+    @pytest.mark.api
+    def test_load_test_reports_every_scenario(self, client):
+        """Проверяем, что нагрузочный тест в открытой модели выполняет заданное количество запросов
+        и возвращает статистику по каждому сценарию."""
+        pf, _ = client
+        mix = {'list': 1, 'create_simple': 1, 'update': 1, 'delete': 1}
+
+        report = LoadTest(pf, valid_email, valid_password, mix, seed=1).run(rps=500, requests=40, workers=8)
+
+        assert report['requests'] == 40 and report['errors'] == 0
+        assert set(report['scenarios']) <= set(mix)
+        assert all(scenario['latency']['p99'] >= scenario['latency']['p50']
+                   for scenario in report['scenarios'].values())
+
+
+class TestCassette:
+    @pytest.mark.api
+    def test_cassette_replays_recorded_responses_without_server(self, mock_server, tmp_path):
+        """Проверяем, что ответы, записанные в кассету, воспроизводятся в том же порядке без обращения
+        к серверу, а секретные заголовки в кассету не попадают."""
+        path = str(tmp_path / 'cassette.jsonl')
+        photo = os.path.join(os.path.dirname(__file__), 'images/Deyk.jpg')
+
+        def scenario(pf):
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_with_photo(key, 'Deyk', 'dog', 3, photo)
+            before = [p.id for p in pf.iter_pets(key, 'my_pets')]
+            pf.delete_pet(key, pet['id'])
+            _, after = pf.get_list_of_pets(key, 'my_pets')
+            return pet, before, after
+
+        with Cassette(path, 'record') as cassette, PetFriends(base_url=mock_server.base_url, cassette=cassette) as pf:
+            recorded = scenario(pf)
+        requests_count = mock_server.requests_count
+
+        with Cassette(path, 'replay') as cassette, PetFriends(base_url=mock_server.base_url, cassette=cassette) as pf:
+            assert scenario(pf) == recorded
+        assert mock_server.requests_count == requests_count
+
+        with open(path, encoding='utf-8') as file:
+            content = file.read()
+        assert valid_password not in content and valid_email not in content
+
+
+class TestCache:
+    @pytest.mark.api
+    def test_list_cache_hits_revalidates_and_invalidates_on_write(self, mock_server):
+        """Проверяем, что кэш списка питомцев отдает свежий ответ без запроса, проверяет устаревший
+        ответ по ETag и очищается после удаления питомца через клиент."""
+        cache = ResponseCache(ttl=0.5)
+        with PetFriends(base_url=mock_server.base_url, cache=cache) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Cached', 'cat', 1)
+
+            _, first = pf.get_list_of_pets(key, 'my_pets')
+            requests_count = mock_server.requests_count
+            _, second = pf.get_list_of_pets(key, 'my_pets')
+            assert second == first and mock_server.requests_count == requests_count
+
+            time.sleep(0.5)
+            _, third = pf.get_list_of_pets(key, 'my_pets')
+            assert third == first and mock_server.requests_count == requests_count + 1
+
+            pf.delete_pet(key, pet['id'])
+            _, after = pf.get_list_of_pets(key, 'my_pets')
+            assert pet['id'] not in [p['id'] for p in after['pets']]
+
+        assert cache.stats() == {'hits': 1, 'revalidations': 1, 'misses': 2, 'invalidations': 1, 'size': 1}
+
+
+class TestImaging:
+    @pytest.mark.api
+    def test_photo_processor_downscales_caches_and_rejects_gif(self, mock_server):
+        """Проверяем, что фото перед загрузкой перекодируется в JPEG не больше заданного размера,
+        повторная загрузка берет результат из кэша, а gif отклоняется без запроса к серверу."""
+        images = os.path.join(os.path.dirname(__file__), 'images')
+        with PhotoProcessor(max_size=400, workers=1) as processor, \
+                PetFriends(base_url=mock_server.base_url, photo_processor=processor) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+
+            status, pet = pf.add_new_pet_with_photo(key, 'Vasiliy', 'cat', 2, os.path.join(images, 'Vasiliy.png'))
+            assert status == 200 and pet['pet_photo'].startswith('data:image/jpeg;base64,')
+            status, _ = pf.add_pet_photo(key, pet['id'], os.path.join(images, 'Vasiliy.png'))
+            assert status == 200
+
+            requests_count = mock_server.requests_count
+            with pytest.raises(ValueError):
+                pf.add_new_pet_with_photo(key, 'Deyk', 'dog', 3, os.path.join(images, 'Deyk.gif'))
+            assert mock_server.requests_count == requests_count
+            pf.delete_pet(key, pet['id'])
+
+        stats = processor.stats()
+        assert stats['processed'] == 1 and stats['cache_hits'] == 1
+        assert stats['bytes_saved'] > stats['bytes_out']
+
+    def test_photo_processor_never_returns_oversized_photo(self):
+        """Проверяем, что JPEG больше max_size уменьшается, даже если перекодированный файл получается
+        больше исходного, а JPEG, который уже укладывается в max_size, отправляется без изменений."""
+        noise = Image.effect_noise((1200, 900), 64).convert('RGB')
+        large, small = io.BytesIO(), io.BytesIO()
+        noise.save(large, 'JPEG', quality=5)
+        noise.resize((400, 300)).save(small, 'JPEG', quality=30)
+
+        with PhotoProcessor(max_size=1000, quality=95, workers=0) as processor:
+            result = processor.process(large.getvalue())
+            assert len(result) > len(large.getvalue())
+            assert max(Image.open(io.BytesIO(result)).size) == 1000
+            assert processor.process(small.getvalue()) == small.getvalue()
+
+
+class TestThrottle:
+    @pytest.mark.api
+    def test_rate_limiter_keeps_threads_under_server_throttle(self):
+        """Проверяем, что общий для потоков ограничитель частоты не дает клиенту превысить лимит
+        сервера, который отвечает 429 на лишние запросы."""
+        with MockPetFriendsServer(users={valid_email: valid_password}, throttle=100) as server, \
+                PetFriends(base_url=server.base_url, rate_limiter=TokenBucket(80)) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                statuses = list(pool.map(lambda _: pf.get_list_of_pets(key)[0], range(40)))
+
+        assert statuses == [200] * 40
+
+    @pytest.mark.api
+    def test_adaptive_limiter_sees_retried_responses_and_honours_retry_after(self, mock_server):
+        """Проверяем, что ответы 429 и 503 на повторяемые запросы DELETE и GET доходят до ограничителя:
+        лимит одновременных запросов уменьшается, повтор ждет время из Retry-After, а успешные ответы
+        снова увеличивают лимит."""
+        events = []
+        limiter = AdaptiveLimiter(initial=8, latency_tolerance=None)
+        with PetFriends(base_url=mock_server.base_url, concurrency_limiter=limiter, metrics=events.append) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+
+            mock_server.fail_next(1, 429, {'Retry-After': '1'})
+            start = time.perf_counter()
+            assert pf.delete_pet(key, pet['id']) == 200
+            assert time.perf_counter() - start >= 0.9
+            assert pf.limits()['concurrency_limit'] == 4
+
+            mock_server.fail_next(2, 503)
+            assert pf.get_list_of_pets(key)[0] == 200
+            assert pf.limits()['concurrency_limit'] == 2
+
+            for _ in range(8):
+                assert pf.get_list_of_pets(key)[0] == 200
+            assert pf.limits()['concurrency_limit'] == 4
+
+        assert [(e.method, e.status) for e in events[2:6]] == \
+            [('DELETE', 429), ('DELETE', 200), ('GET', 503), ('GET', 503)]
+
+    @pytest.mark.api
+    def test_retry_after_pauses_shared_rate_limiter(self, mock_server):
+        """Проверяем, что Retry-After из ответа на повторяемый запрос приостанавливает общий ограничитель
+        частоты, а не только повтор этого запроса внутри сессии."""
+        bucket = TokenBucket(1000, burst=10)
+        with PetFriends(base_url=mock_server.base_url, rate_limiter=bucket) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+            _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+
+            mock_server.fail_next(1, 429, {'Retry-After': '1'})
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                deleted = pool.submit(pf.delete_pet, key, pet['id'])
+                time.sleep(0.3)
+                assert bucket.delay() > 0.3
+                assert deleted.result() == 200
+
+
+class TestCleanup:
+    @pytest.mark.api
+    def test_cleanup_resumes_from_checkpoint(self, client, tmp_path, monkeypatch):
+        """Проверяем, что прерванная очистка продолжается по файлу checkpoint: удаленные питомцы
+        не удаляются повторно, питомцы, созданные после начала очистки, не затрагиваются."""
+        pf, key = client
+        checkpoint = str(tmp_path / 'cleanup.jsonl')
+        ids = [pf.add_new_pet_simple(key, f'Cleanup{i}', 'cat', i + 1)[1]['id'] for i in range(6)]
+        kept = pf.add_new_pet_simple(key, 'Cleanup0', 'dog', 1)[1]['id']
+
+        delete_pet = pf.delete_pet
+        deleted = []
+
+        def interrupted(get_key, pet_id):
+            if pet_id in ids[3:]:
+                raise ConnectionError('interrupted')
+            deleted.append(pet_id)
+            return delete_pet(get_key, pet_id)
+
+        monkeypatch.setattr(pf, 'delete_pet', interrupted)
+        first = pf.cleanup_pets(key, name=r'Cleanup\d+', animal_type='cat', checkpoint=checkpoint,
+                                workers=2, batch_size=2).run()
+        assert (first.matched, first.deleted, first.verified, len(first.failures)) == (6, 3, 3, 3)
+        assert os.path.exists(checkpoint)
+
+        late = pf.add_new_pet_simple(key, 'Cleanup9', 'cat', 1)[1]['id']
+        monkeypatch.setattr(pf, 'delete_pet', delete_pet)
+        second = pf.cleanup_pets(key, name=r'Cleanup\d+', animal_type='cat', checkpoint=checkpoint).run()
+
+        assert second.ok and second.resumed
+        assert (second.deleted, second.verified) == (3, 3)
+        assert sorted(deleted) == sorted(ids[:3])
+        assert not os.path.exists(checkpoint)
+        remaining = {pet.id for pet in pf.iter_pets(key, 'my_pets')}
+        assert not remaining & set(ids)
+        assert {kept, late} <= remaining
+        pf.bulk_delete(key, [kept, late]).summary()
+
+    def test_default_cleanup_pattern_matches_every_test_pet(self):
+        """Проверяем, что шаблон --cleanup по умолчанию подходит под имена всех питомцев, которых
+        создают тесты, и не подходит под другие имена."""
+        cleanup = Cleanup(None, None, name=CLEANUP_NAMES)
+        names = [case.values['name'] for case in VALID_PETS] + ['Deyk', 'Load', 'Vasiliy gw3', '']
+
+        assert all(cleanup.matches({'name': name}) for name in names)
+        assert not any(cleanup.matches({'name': name}) for name in ['Vasiliy', 'Deyk2', 'x' * 256, 'Мурка'])
+
+
+class TestKeys:
+    @pytest.mark.auth
+    def test_key_is_refreshed_after_server_rotates_keys(self, client, mock_server):
+        """Проверяем, что после того как сервер перестал принимать ключ, клиент получает новый ключ
+        и успешно повторяет запрос."""
+        pf, key = client
+
+        mock_server.rotate_keys()
+        status, _ = pf.get_list_of_pets(key, 'my_pets')
+
+        assert status == 200
+        assert pf.keys.current(key['key']) != key['key']
+
+    @pytest.mark.auth
+    def test_concurrent_get_key_makes_one_request(self, mock_server):
+        """Проверяем, что одновременные запросы ключа из разных потоков объединяются в один запрос."""
+        with PetFriends(base_url=mock_server.base_url) as pf:
+            requests_count = mock_server.requests_count
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: pf.get_key(valid_email, valid_password), range(16)))
+
+        assert mock_server.requests_count == requests_count + 1
+        assert len({result['key'] for _, result in results}) == 1
+
+    @pytest.mark.auth
+    def test_key_is_cached_on_disk_until_ttl_expires(self, mock_server, tmp_path):
+        """Проверяем, что ключ из кэша на диске используется новым клиентом без запроса к серверу,
+        а по истечении key_ttl запрашивается заново. Пароль в файл не записывается."""
+        path = str(tmp_path / 'keys.json')
+        with PetFriends(base_url=mock_server.base_url, key_cache_path=path, key_ttl=0.3) as pf:
+            _, key = pf.get_key(valid_email, valid_password)
+
+        requests_count = mock_server.requests_count
+        with PetFriends(base_url=mock_server.base_url, key_cache_path=path, key_ttl=0.3) as pf:
+            assert pf.get_key(valid_email, valid_password) == (200, key)
+            assert mock_server.requests_count == requests_count
+
+            time.sleep(0.3)
+            assert pf.get_key(valid_email, valid_password)[0] == 200
+            assert mock_server.requests_count == requests_count + 1
+
+        with open(path, encoding='utf-8') as file:
+            assert valid_password not in file.read()
+
+
+class TestBulk:
+    @pytest.mark.api
+    def test_bulk_create_and_delete(self, client):
+        """Проверяем, что пакетные создание и удаление питомцев выполняются без ошибок."""
+        pf, key = client
+
+        created = pf.bulk_create(key, ({'name': f'Deyk{i}', 'animal_type': 'dog', 'age': i + 1} for i in range(20)),
+                                 workers=4).summary()
+        assert created.total == 20 and not created.failures
+
+        deleted = pf.bulk_delete(key, (item.result['id'] for item in created.successes), workers=4).summary()
+        assert deleted.total == 20 and not deleted.failures
+
+    @pytest.mark.api
+    def test_bulk_update_and_set_photo_report_failures(self, client):
+        """Проверяем, что неуспешные операции попадают в failures с исходным элементом,
+        а успешные - в successes."""
+        pf, key = client
+        photo = os.path.join(os.path.dirname(__file__), 'images/Deyk.jpg')
+        ids = [pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)[1]['id'] for _ in range(3)]
+
+        updated = pf.bulk_update(key, [{'pet_id': pet_id, 'name': 'Bulk', 'animal_type': 'cat', 'age': 4}
+                                       for pet_id in ids + ['missing']]).summary()
+        assert len(updated.successes) == 3
+        assert [(r.item['pet_id'], r.status) for r in updated.failures] == [('missing', 400)]
+        assert all(r.result['name'] == 'Bulk' for r in updated.successes)
+
+        with_photo = pf.bulk_set_photo(key, [{'pet_id': pet_id, 'pet_photo': photo} for pet_id in ids]).summary()
+        assert with_photo.total == 3 and not with_photo.failures
+        assert with_photo.as_dict()['percentiles']['max'] >= with_photo.as_dict()['percentiles']['p50']
+        pf.bulk_delete(key, ids).summary()
+
+    @pytest.mark.api
+    def test_bulk_rate_limit(self, client):
+        """Проверяем, что rate_limit ограничивает частоту запросов пакетного задания."""
+        pf, key = client
+
+        summary = pf.bulk_create(key, [{'name': 'Deyk', 'animal_type': 'dog', 'age': 3}] * 10, workers=8,
+                                 rate_limit=50).summary()
+
+        assert summary.total == 10 and not summary.failures
+        assert summary.elapsed >= 9 / 50 * 0.9
+        pf.bulk_delete(key, [r.result['id'] for r in summary.successes]).summary()
+
+
+class TestPhotos:
+    IMAGES = os.path.join(os.path.dirname(__file__), 'images')
+
+    @pytest.mark.api
+    @pytest.mark.parametrize('kind', ['path', 'bytes', 'bytearray', 'memoryview', 'bytesio', 'file'])
+    def test_photo_is_uploaded_from_any_source(self, client, kind):
+        """Проверяем, что фото загружается из пути, bytes/bytearray/memoryview и файлоподобного объекта,
+        а сервер получает его целиком."""
+        pf, key = client
+        path = os.path.join(self.IMAGES, 'Deyk.jpg')
+        with open(path, 'rb') as file:
+            data = file.read()
+        _, pet = pf.add_new_pet_simple(key, 'Deyk', 'dog', 3)
+
+        with open(path, 'rb') as file:
+            photo = {'path': path, 'bytes': data, 'bytearray': bytearray(data), 'memoryview': memoryview(data),
+                     'bytesio': io.BytesIO(data), 'file': file}[kind]
+            status, result = pf.add_pet_photo(key, pet['id'], photo)
+
+        assert status == 200
+        assert result['pet_photo'] == 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+
+    def test_content_type_is_detected_by_signature(self):
+        """Проверяем, что тип содержимого определяется по сигнатуре файла, а не по имени."""
+        with open(os.path.join(self.IMAGES, 'Deyk.jpg'), 'rb') as file:
+            data = file.read()
+        misnamed = io.BytesIO(data)
+        misnamed.name = 'Deyk.png'
+
+        with open_photo(misnamed) as (filename, _, content_type):
+            assert (filename, content_type) == ('Deyk.png', 'image/jpeg')
+        with open_photo(memoryview(data)) as (filename, _, content_type):
+            assert (filename, content_type) == ('pet_photo.jpg', 'image/jpeg')
+        with open_photo(os.path.join(self.IMAGES, 'Vasiliy.png')) as (_, _, content_type):
+            assert content_type == 'image/png'
+
+    def test_only_files_opened_by_path_are_closed(self):
+        """Проверяем, что файл, открытый по пути, закрывается, а переданный файл остается открытым."""
+        path = os.path.join(self.IMAGES, 'Deyk.jpg')
+
+        with open_photo(path) as (_, opened, _):
+            assert not opened.closed
+        assert opened.closed
+
+        with open(path, 'rb') as file:
+            with open_photo(file) as (_, stream, _):
+                assert stream is file
+            assert not file.closed
+
+    @pytest.mark.api
+    def test_progress_reports_every_byte(self, client):
+        """Проверяем, что progress вызывается по мере отправки и завершается полным размером тела."""
+        pf, key = client
+        calls = []
+
+        status, _ = pf.add_new_pet_with_photo(key, 'Deyk', 'dog', 3, os.path.join(self.IMAGES, 'Vasiliy.png'),
+                                              progress=lambda sent, total: calls.append((sent, total)))
+
+        assert status == 200
+        sent = [call[0] for call in calls]
+        assert len(calls) > 1 and sent == sorted(sent)
+        assert calls[-1][0] == calls[-1][1] > os.path.getsize(os.path.join(self.IMAGES, 'Vasiliy.png'))
+
+
+class TestAsyncClient:
+    @pytest.mark.api
+    def test_gather_create_and_delete_keep_input_order(self, mock_server):
+        """Проверяем, что пакетные создание и удаление возвращают результаты в порядке входных данных."""
+        pets = [{'name': f'Async{i}', 'animal_type': 'cat', 'age': i + 1} for i in range(10)]
+
+        async def scenario():
+            async with AsyncPetFriends(base_url=mock_server.base_url, concurrency=4) as pf:
+                _, key = await pf.get_key(valid_email, valid_password)
+                created = await pf.gather_create(key, pets)
+                deleted = await pf.gather_delete(key, [result['id'] for _, result in created])
+                return created, deleted
+
+        created, deleted = asyncio.run(scenario())
+
+        assert [(status, result['name']) for status, result in created] == [(200, pet['name']) for pet in pets]
+        assert deleted == [200] * len(pets)
+
+    @pytest.mark.api
+    def test_concurrency_is_bounded_by_semaphore(self, mock_server):
+        """Проверяем, что одновременно выполняется не больше concurrency запросов."""
+        in_flight, peak = 0, 0
+
+        async def scenario():
+            async with AsyncPetFriends(base_url=mock_server.base_url, concurrency=3) as pf:
+                send = pf._send
+
+                async def measured(*args, **kwargs):
+                    nonlocal in_flight, peak
+                    in_flight += 1
+                    peak = max(peak, in_flight)
+                    try:
+                        await asyncio.sleep(0.01)
+                        return await send(*args, **kwargs)
+                    finally:
+                        in_flight -= 1
+
+                pf._send = measured
+                _, key = await pf.get_key(valid_email, valid_password)
+                results = await asyncio.gather(*(pf.get_list_of_pets(key, 'my_pets') for _ in range(12)))
+                assert all(status == 200 for status, _ in results)
+
+        asyncio.run(scenario())
+
+        assert peak == 3
+
+    @pytest.mark.auth
+    def test_key_is_refreshed_after_server_rotates_keys(self, mock_server):
+        """Проверяем, что на ответ 403 асинхронный клиент получает новый ключ и повторяет запрос."""
+
+        async def scenario():
+            async with AsyncPetFriends(base_url=mock_server.base_url) as pf:
+                _, key = await pf.get_key(valid_email, valid_password)
+                mock_server.rotate_keys()
+                status, _ = await pf.get_list_of_pets(key, 'my_pets')
+                return status, key['key'], pf.keys.current(key['key'])
+
+        status, old_key, new_key = asyncio.run(scenario())
+
+        assert status == 200
+        assert new_key != old_key
+
+    @pytest.mark.api
+    def test_photo_upload_and_reuse_in_new_event_loop(self, mock_server):
+        """Проверяем загрузку фото потоком и то, что закрытый клиент можно использовать в новом цикле
+        событий, а незакрытый - нельзя."""
+        photo = os.path.join(os.path.dirname(__file__), 'images/Deyk.jpg')
+        pf = AsyncPetFriends(base_url=mock_server.base_url)
+
+        async def create():
+            _, key = await pf.get_key(valid_email, valid_password)
+            return await pf.add_new_pet_with_photo(key, 'Deyk', 'dog', 3, photo)
+
+        async def create_and_close():
+            try:
+                return await create()
+            finally:
+                await pf.close()
+
+        for _ in range(2):
+            status, result = asyncio.run(create_and_close())
+            assert status == 200
+            assert result['pet_photo'].startswith('data:image/jpeg;base64,')
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(create())
+        with pytest.raises(RuntimeError):
+            asyncio.run(create())
+        loop.run_until_complete(pf.close())
+        loop.close()
+
+
+class TestDatagen:
+    def test_pairwise_cases_cover_every_pair(self):
+        """Проверяем, что попарный набор покрывает все пары значений, меньше полного перебора
+        и не содержит повторяющихся значений."""
+        factors = {'name': ['a', 'b', 'c', 'a'], 'animal_type': ['x', 'y', 'z'], 'age': ['1', '99'],
+                   'photo': ['jpg', 'png']}
+
+        generated = cases(factors)
+
+        pairs = {(a, case[a], b, case[b]) for case in generated
+                 for a, b in itertools.combinations(sorted(factors), 2)}
+        assert len(pairs) == 3 * 3 + 4 * 3 * 2 + 2 * 2
+        assert len(generated) < 3 * 3 * 2 * 2
+        assert len(cases(factors, budget=5)) == 5
+        assert len(cases(factors, strength=1)) == 3
+
+
+class TestStartup:
+    def test_import_is_lazy(self):
+        """Проверяем, что импорт api и settings не загружает requests, dotenv и asyncio.
+        Время импорта проверяет бенчмарк benchmarks/bench_import.py."""
+        _, loaded = import_time(runs=1)
+
+        assert loaded == []
+
+    def test_settings_prefer_explicit_args_then_environment(self, tmp_path, monkeypatch):
+        """Проверяем порядок источников настроек: аргументы, окружение, файл .env."""
+        env_file = tmp_path / '.env'
+        env_file.write_text('valid_email=file@example.com\nvalid_password=file\n')
+        monkeypatch.setenv('valid_password', 'env')
+        monkeypatch.delenv('valid_email', raising=False)
+        monkeypatch.delenv('base_url', raising=False)
+
+        settings = Settings(env_file=str(env_file), base_url='http://localhost/')
+
+        assert (settings.valid_email, settings.valid_password, settings.base_url) == \
+            ('file@example.com', 'env', 'http://localhost/')
@@ -1,23 +1,9 @@
-from api import PetFriends
+from datagen import cases
 from settings import valid_email, valid_password
 import os
 import pytest
 import datetime
 
-pf = PetFriends()
-
-
-@pytest.fixture(scope="class", autouse=True)
-def get_key(email=valid_email, password=valid_password):
-    """Фикстура проверяет, что запрос API ключа возвращает статус 200 и в результате содержится слово key,
-    и возвращает API ключ. Запускается для каждого тестового класса"""
-
-    #  Отправляем запрос и сохраняем полученный ответ с кодом статуса в status, а текст ответа в pytest.key.
-    status, pytest.key = pf.get_api_key(email, password)
-    assert status == 200, 'Запрос выполнен неуспешно'
-    assert 'key' in pytest.key, 'В запросе не передан ключ авторизации'
-    return pytest.key
-
 
 @pytest.fixture(scope="class", autouse=True)
 def time_delta():
@@ -45,11 +31,22 @@ def special_chars():
     return '|\\/!@#$%^&*()-_=+`~?"№;:[]{}'
 
 
+# Классы эквивалентности валидных строковых значений.
+VALID_STRINGS = {'255 symbols': generate_string(255), 'more than 1000 symbols': generate_string(1001),
+                 'russian': russian_chars(), 'RUSSIAN': russian_chars().upper(),
+                 'chinese': chinese_chars(), 'specials': special_chars(), 'digit': '123'}
+
+# Вместо полного перебора 7x7 классов имени и типа животного берутся 14 наборов, в которых встречаются
+# все классы и граничные значения возраста и как можно больше их пар (см. datagen.cases).
+VALID_PETS = cases({'name': VALID_STRINGS, 'animal_type': VALID_STRINGS, 'age': {'min': '1', 'max': '99'}},
+                   budget=14)
+
+
 class TestPositive:
     @pytest.mark.api
     @pytest.mark.parametrize("filter", ['', 'my_pets'],
                              ids=['empty string', 'only my pets'])
-    def test_get_all_pets_with_valid_key(self, get_key, filter):
+    def test_get_all_pets_with_valid_key(self, pf, get_key, pet, filter):
         """Проверяем, что запрос на получение списка питомцев с валидными данными возвращает статус 200
         и не пустое тело ответа."""
         pytest.status, result = pf.get_list_of_pets(get_key, filter)
@@ -59,7 +56,7 @@ class TestPositive:
         assert len(result['pets']) > 0
 
     @pytest.mark.api
-    def test_add_new_pet_with_valid_data(self, get_key, name='Deyk', animal_type='dog', age=3,
+    def test_add_new_pet_with_valid_data(self, pf, get_key, created_pets, name='Deyk', animal_type='dog', age=3,
                                          pet_photo='images/Deyk.jpg'):
         """Проверяем, что запрос на создание питомца с фото с валидными данными возвращает статус 200
         и имя созданного питомца соответствует ожидаемому."""
@@ -72,10 +69,12 @@ class TestPositive:
 
         # Сверяем полученный ответ с ожидаемым результатом.
         assert status == 200
+        created_pets.append(result['id'])
         assert result['name'] == name
 
     @pytest.mark.api
-    def test_add_new_pet_simple_with_valid_data(self, get_key, name='Deyk', animal_type='dog', age='3'):
+    def test_add_new_pet_simple_with_valid_data(self, pf, get_key, created_pets, name='Deyk', animal_type='dog',
+                                                age='3'):
         """Проверяем, что запрос на создание питомца без фото с валидными данными возвращает статус 200
         и имя созданного питомца соответствует ожидаемому."""
 
@@ -84,113 +83,71 @@ class TestPositive:
 
         # Сверяем полученный ответ с ожидаемым результатом.
         assert status == 200
+        created_pets.append(result['id'])
         assert result['name'] == name
 
     @pytest.mark.api
-    @pytest.mark.parametrize("name", [generate_string(255), generate_string(1001),
-                                      russian_chars(), russian_chars().upper(),
-                                      chinese_chars(), special_chars(), '123'],
-                             ids=['255 symbols', 'more than 1000 symbols',
-                                  'russian', 'RUSSIAN',
-                                  'chinese', 'specials', 'digit'])
-    @pytest.mark.parametrize("animal_type", [generate_string(255), generate_string(1001),
-                                             russian_chars(), russian_chars().upper(),
-                                             chinese_chars(), special_chars(), '123'],
-                             ids=['255 symbols', 'more than 1000 symbols',
-                                  'russian', 'RUSSIAN',
-                                  'chinese', 'specials', 'digit'])
-    @pytest.mark.parametrize("age", ['1'], ids=['min'])
-    def test_add_new_pet_simple_with_different_valid_data(self, get_key, name, animal_type, age):
-        """Проверяем, что запрос на создание питомца без фото с различными валидными данными возвращает статус 200
-        и данные питомца соответствуют ожидаемым."""
+    def test_add_new_pets_simple_in_bulk_with_generated_data(self, pf, get_key, created_pets):
+        """Проверяем, что пакетное создание питомцев со всеми сгенерированными наборами валидных данных
+        выполняется без ошибок и данные каждого питомца соответствуют ожидаемым."""
 
-        # Добавляем питомца
-        pytest.status, result = pf.add_new_pet_simple(get_key, name, animal_type, age)
+        # Создаем всех питомцев одним пакетом в пуле потоков.
+        summary = pf.bulk_create(get_key, [case.values for case in VALID_PETS]).summary()
+        created_pets.extend(item.result['id'] for item in summary.successes)
 
-        # Сверяем полученный ответ с ожидаемым результатом
-        assert pytest.status == 200
-        assert result['name'] == name
-        assert result['age'] == age
-        assert result['animal_type'] == animal_type
+        # Сверяем полученные ответы с ожидаемым результатом; в сообщении об ошибке - классы значений набора.
+        assert not summary.failures, [VALID_PETS[item.index].id for item in summary.failures]
+        for item in summary.successes:
+            assert {name: item.result[name] for name in item.item} == item.item, VALID_PETS[item.index].id
 
     @pytest.mark.api
-    def test_update_pet_info_with_valid_data(self, get_key, name='Deyk', animal_type='dog', age=5):
-        """Проверяем, что запрос на обновление данных о своем последнем созданном питомце
-        с валидными данными возвращает статус 200 и обновленные данные соответствуют ожидаемым."""
-
-        # Получаем список своих питомцев.
-        _, my_pets = pf.get_list_of_pets(get_key, 'my_pets')
-
-        # Если список не пустой, обновляем данные о своем последнем созданном питомце.
-        if len(my_pets['pets']) > 0:
-            #  Отправляем запрос и сохраняем полученный ответ с кодом статуса в status, а текст ответа в result.
-            status, result = pf.update_pet_info(get_key, my_pets['pets'][0]['id'], name, animal_type, age)
+    def test_update_pet_info_with_valid_data(self, pf, get_key, pet, name='Deyk', animal_type='dog', age=5):
+        """Проверяем, что запрос на обновление данных о питомце с валидными данными возвращает статус 200
+        и обновленные данные соответствуют ожидаемым."""
 
-            # Сверяем полученный ответ с ожидаемым результатом.
-            assert status == 200
-            assert result['name'] == name
-            assert result['animal_type'] == animal_type
-            assert result['age'] == str(age)
+        #  Отправляем запрос и сохраняем полученный ответ с кодом статуса в status, а текст ответа в result.
+        status, result = pf.update_pet_info(get_key, pet['id'], name, animal_type, age)
 
-        # Если список пустой, вызываем исключение с сообщением об отсутствии своих питомцев.
-        else:
-            raise Exception("There aren't my pets.")
+        # Сверяем полученный ответ с ожидаемым результатом.
+        assert status == 200
+        assert result['name'] == name
+        assert result['animal_type'] == animal_type
+        assert result['age'] == str(age)
 
     @pytest.mark.api
-    def test_delete_pet_with_valid_data(self, get_key):
+    def test_delete_pet_with_valid_data(self, pf, get_key, pet):
         """Проверяем, что запрос на удаление питомца с валидными данными возвращает статус 200
         и id удаленного питомца нет в списке питомцев."""
 
-        # Получаем список своих питомцев.
-        _, my_pets = pf.get_list_of_pets(get_key, 'my_pets')
-
-        # Если список не пустой, удаляем питомца, созданного последним.
-        if len(my_pets['pets']) > 0:
-            # Берем id питомца, созданного последним.
-            pet_id = my_pets['pets'][0]['id']
-
-            # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
-            status = pf.delete_pet(get_key, pet_id)
-
-            # Повторно запрашиваем список своих питомцев.
-            _, my_pets = pf.get_list_of_pets(get_key, 'my_pets')
+        # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
+        status = pf.delete_pet(get_key, pet['id'])
 
-            # Сверяем полученный ответ с ожидаемым результатом.
-            assert status == 200
-            assert pet_id not in my_pets
+        # Повторно запрашиваем список своих питомцев.
+        _, my_pets = pf.get_list_of_pets(get_key, 'my_pets')
 
-        # Если список пустой, вызываем исключение с сообщением об отсутствии своих питомцев.
-        else:
-            raise Exception("There aren't my pets.")
+        # Сверяем полученный ответ с ожидаемым результатом.
+        assert status == 200
+        assert pet['id'] not in [my_pet['id'] for my_pet in my_pets['pets']]
 
     @pytest.mark.api
-    def test_add_pet_photo_with_valid_data(self, get_key, pet_photo='images/Deyk.jpg'):
+    def test_add_pet_photo_with_valid_data(self, pf, get_key, pet, pet_photo='images/Deyk.jpg'):
         """Проверяем, что запрос на добавление фото питомца с валидными данными возвращает статус 200
-        и id созданного питомца соответствует ожидаемому."""
+        и id питомца соответствует ожидаемому."""
 
         # Получаем полный путь до файла с фото питомца
         pet_photo = os.path.join(os.path.dirname(__file__), pet_photo)
 
-        # Получаем список своих питомцев.
-        _, my_pets = pf.get_list_of_pets(get_key, 'my_pets')
-
-        # Если список не пустой, добавляем фото для своего последнего созданного питомца.
-        if len(my_pets['pets']) > 0:
-            #  Отправляем запрос и сохраняем полученный ответ с кодом статуса в status, а текст ответа в result.
-            status, result = pf.add_pet_photo(get_key, my_pets['pets'][0]['id'], pet_photo)
-
-            # Сверяем полученный ответ с ожидаемым результатом.
-            assert status == 200
-            assert result['id'] == my_pets['pets'][0]['id']
+        #  Отправляем запрос и сохраняем полученный ответ с кодом статуса в status, а текст ответа в result.
+        status, result = pf.add_pet_photo(get_key, pet['id'], pet_photo)
 
-        # Если список пустой, вызываем исключение с сообщением об отсутствии своих питомцев.
-        else:
-            raise Exception("There aren't my pets.")
+        # Сверяем полученный ответ с ожидаемым результатом.
+        assert status == 200
+        assert result['id'] == pet['id']
 
 
 class TestNegative:
     @pytest.mark.auth
-    def test_unsuccessful_get_api_key_with_empty_email(self, email='', password=valid_password):
+    def test_unsuccessful_get_api_key_with_empty_email(self, pf, email='', password=valid_password):
         """Проверяем, что запрос API ключа с пустым значением email возвращает статус 403."""
 
         # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
@@ -200,7 +157,7 @@ class TestNegative:
         assert status == 403
 
     @pytest.mark.auth
-    def test_unsuccessful_get_api_key_with_empty_password(self, email=valid_email, password=''):
+    def test_unsuccessful_get_api_key_with_empty_password(self, pf, email=valid_email, password=''):
         """Проверяем, что запрос API ключа с пустым значением пароля возвращает статус 403."""
 
         # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
@@ -210,7 +167,7 @@ class TestNegative:
         assert status == 403
 
     @pytest.mark.auth
-    def test_unsuccessful_get_api_key_with_empty_params(self, email='', password=''):
+    def test_unsuccessful_get_api_key_with_empty_params(self, pf, email='', password=''):
         """Проверяем, что запрос API ключа с пустыми полями возвращает статус 403."""
 
         # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
@@ -220,7 +177,7 @@ class TestNegative:
         assert status == 403
 
     @pytest.mark.auth
-    def test_unsuccessful_get_api_key_with_swap_params(self, email=valid_email, password=valid_password):
+    def test_unsuccessful_get_api_key_with_swap_params(self, pf, email=valid_email, password=valid_password):
         """Проверяем, что запрос API ключа с валидным email в поле пароля
         и валидным паролем в поле email возвращает статус 403."""
 
@@ -231,7 +188,7 @@ class TestNegative:
         assert status == 403
 
     @pytest.mark.auth
-    def test_unsuccessful_get_api_key_with_invalid_password(self, email=valid_email, password=valid_password + 'a'):
+    def test_unsuccessful_get_api_key_with_invalid_password(self, pf, email=valid_email, password=valid_password + 'a'):
         """Проверяем, что запрос API ключа с невалидным паролем возвращает статус 403."""
 
         # Отправляем запрос и сохраняем полученный ответ с кодом статуса в status.
@@ -248,7 +205,7 @@ class TestNegative:
                                   'russian', 'RUSSIAN',
                                   'chinese', 'specials', 'digit'])
     @pytest.mark.skip(reason="API запрос GET_/api/pets работает с ошибкой.")
-    def test_unsuccessful_get_all_pets_with_invalid_filter(self, get_key, filter):
+    def test_unsuccessful_get_all_pets_with_invalid_filter(self, pf, get_key, filter):
         """Проверяем, что запрос на получение списка питомцев с невалидными значениями параметра "filter" возвращает
          статус 400.
         API запрос работает с ошибкой. Вместо кода 400 приходит код 500."""
@@ -259,7 +216,7 @@ class TestNegative:
 
     @pytest.mark.api
     @pytest.mark.skip(reason="API запрос POST_/api/pets работает с ошибкой.")
-    def test_unsuccessful_add_new_pet_with_gif_file(self, get_key, name='Deyk', animal_type='dog', age=3,
+    def test_unsuccessful_add_new_pet_with_gif_file(self, pf, get_key, name='Deyk', animal_type='dog', age=3,
                                                     pet_photo='images/Deyk.gif'):
         """Проверяем, что запрос на создание питомца с файлом gif вместо фото возвращает статус 400.
         API запрос работает с ошибкой. При создании питомца с файлом gif создается питомец без фото.
@@ -276,7 +233,7 @@ class TestNegative:
 
     @pytest.mark.api
     @pytest.mark.xfail(reason="API запрос POST_/api/create_pet_simple работает с ошибкой.")
-    def test_unsuccessful_add_new_pet_simple_with_str_age(self, get_key, name='Deyk', animal_type='dog',
+    def test_unsuccessful_add_new_pet_simple_with_str_age(self, pf, get_key, name='Deyk', animal_type='dog',
                                                                  age='five'):
         """Проверяем, что запрос на создание питомца без фото со строковым значением возраста возвращает статус 400.
         API запрос работает с ошибкой. Питомец создается со строковым значением возраста.
@@ -298,7 +255,7 @@ class TestNegative:
                              ids=['empty', 'negative', 'zero', 'greater than max', 'float',
                                   'int_max', 'int_max + 1', 'specials',
                                   'russian', 'RUSSIAN', 'chinese'])
-    def test_unsuccessful_add_new_pet_simple_with_invalid_params(self, name, animal_type, age):
+    def test_unsuccessful_add_new_pet_simple_with_invalid_params(self, pf, get_key, name, animal_type, age):
         """Проверяем, что запрос на создание питомца без фото с невалидными значениями параметров возвращает статус 400.
         API запрос работает с ошибкой. Вместо кода 400 приходит код 200."""
 
@@ -310,7 +267,7 @@ class TestNegative:
 
     @pytest.mark.api
     @pytest.mark.skip(reason="API запрос POST_/api/pets работает с ошибкой.")
-    def test_unsuccessful_add_new_pet_simple_with_empty_name(self, get_key, name='', animal_type='dog', age=5):
+    def test_unsuccessful_add_new_pet_simple_with_empty_name(self, pf, get_key, name='', animal_type='dog', age=5):
         """Проверяем, что запрос на создание питомца без фото с пустым значением имени возвращает статус 400.
         API запрос работает с ошибкой. Питомец создается без имени.
         Вместо кода 400 приходит код 200."""
@@ -0,0 +1,203 @@
+import threading
+import time
+
+
+def parse_retry_after(value) -> float:
+    """Функция возвращает задержку из заголовка Retry-After в секундах (значение может быть числом
+    секунд или датой HTTP) или None, если заголовка нет или его не удалось разобрать."""
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов (token bucket), общий для всех потоков и задач клиента.
+
+    В корзину поступает rate токенов в секунду, но не больше burst; каждый запрос забирает один
+    токен, а если токенов нет - ждет их поступления. Ожидающие запросы резервируют токены заранее,
+    поэтому стартуют в порядке очереди с интервалом 1/rate. pause(seconds) приостанавливает выдачу
+    токенов (например, по заголовку Retry-After)."""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = burst
+        self.waiting = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Метод забирает токен (возможно, в долг) и возвращает время ожидания в секундах."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            debt = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(debt, self._paused_until - now)
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            with self._lock:
+                self.waiting += 1
+            try:
+                time.sleep(delay)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+    async def aacquire(self) -> None:
+        import asyncio
+
+        delay = self.reserve()
+        if delay > 0:
+            with self._lock:
+                self.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+    def try_acquire(self) -> bool:
+        """Метод забирает токен без ожидания и возвращает False, если токенов нет."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until or self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def delay(self) -> float:
+        """Метод возвращает время в секундах до появления свободного токена."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return max((1 - self._tokens) / self.rate if self._tokens < 1 else 0.0, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveLimiter:
+    """Адаптивное ограничение количества одновременных запросов по принципу AIMD.
+
+    Запрос ждет в acquire, пока количество выполняемых запросов не станет меньше limit, и сообщает
+    результат в release. Каждый успешный ответ увеличивает лимит на increase / limit (то есть
+    примерно на increase за каждые limit ответов), а ответ 429 или 5xx, ошибка соединения или рост
+    сглаженного времени ответа больше чем в latency_tolerance раз относительно минимального
+    умножает лимит на backoff. Лимит снижается не чаще одного раза на запросы, отправленные после
+    предыдущего снижения, чтобы одна перегрузка не обрушила его до минимума. Если в ответе есть
+    Retry-After, новые запросы не отправляются до истечения этого времени.
+    queue_depth - количество запросов, ожидающих в acquire, in_flight - количество выполняемых."""
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 100, increase: float = 1,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._limit = float(initial)
+        self._min_latency = None
+        self._smoothed_latency = None
+        self._last_decrease = 0.0
+        self._blocked_until = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def _enter(self, now: float) -> float:
+        """Метод занимает место для запроса и возвращает 0 или время, которое нужно подождать
+        (None - ждать освобождения места). Вызывается под self._condition."""
+
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            return 0
+        return None
+
+    def acquire(self) -> None:
+        with self._condition:
+            self.queue_depth += 1
+            try:
+                while True:
+                    delay = self._enter(time.monotonic())
+                    if delay == 0:
+                        return
+                    self._condition.wait(delay)
+            finally:
+                self.queue_depth -= 1
+
+    async def aacquire(self) -> None:
+        import asyncio
+
+        with self._condition:
+            self.queue_depth += 1
+        try:
+            while True:
+                with self._condition:
+                    delay = self._enter(time.monotonic())
+                if delay == 0:
+                    return
+                # Condition нельзя ждать из цикла событий, поэтому задача проверяет лимит периодически.
+                await asyncio.sleep(min(delay or 0.005, 0.05))
+        finally:
+            with self._condition:
+                self.queue_depth -= 1
+
+    def release(self, status: int = None, latency: float = None, retry_after: float = None) -> None:
+        """Метод освобождает место и корректирует лимит по статусу ответа (None - ошибка соединения),
+        времени ответа latency в секундах и задержке retry_after из заголовка Retry-After."""
+
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            overloaded = status is None or status == 429 or status >= 500
+            if latency is not None and not overloaded:
+                if self._min_latency is None or latency < self._min_latency:
+                    self._min_latency = latency
+                if self._smoothed_latency is None:
+                    self._smoothed_latency = latency
+                self._smoothed_latency += 0.2 * (latency - self._smoothed_latency)
+                overloaded = bool(self.latency_tolerance) and \
+                    self._smoothed_latency > self._min_latency * self.latency_tolerance
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+            started = now - (latency or 0.0)
+            if overloaded:
+                if started >= self._last_decrease:
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff)
+                    self._last_decrease = now
+                    # После снижения базовое время ответа пересчитывается заново.
+                    self._min_latency = self._smoothed_latency = None
+            else:
+                self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+            self._condition.notify_all()
@@ -0,0 +1,87 @@
+"""Транспорт клиента PetFriends: сессия requests с пулом соединений, повторами и замером времени
+установки соединений. Модуль импортируется при первом запросе клиента, а не при импорте api.py."""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Методы, запросы которых можно повторять.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+# Время установки последнего соединения в текущем потоке: (DNS + TCP, TLS) в секундах.
+_connect_timings = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        _connect_timings.value = (time.perf_counter() - start, None)
+        return sock
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        self._connect_time = time.perf_counter() - start
+        return sock
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        total = time.perf_counter() - start
+        connect = getattr(self, '_connect_time', total)
+        _connect_timings.value = (connect, total - connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, соединения которого запоминают время установки TCP-соединения и TLS-рукопожатия
+    (см. pop_connect_timings)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+def pop_connect_timings():
+    """Функция возвращает (connect, tls) для соединения, установленного в текущем потоке после
+    предыдущего вызова, или (None, None), если запрос использовал соединение из пула."""
+
+    timings = getattr(_connect_timings, 'value', (None, None))
+    _connect_timings.value = (None, None)
+    return timings
+
+
+def new_session(pool_connections: int = 10, pool_maxsize: int = 10, retries: int = 3,
+                backoff_factor: float = 0.3, retry_status: bool = True) -> requests.Session:
+    """Функция создает сессию requests с пулом keep-alive соединений TimedHTTPAdapter. Идемпотентные
+    запросы при ошибках соединения повторяются retries раз, а если retry_status=True - еще и при
+    ответах 502/503/504 и ответах 429/503 с заголовком Retry-After."""
+
+    retry = Retry(total=retries, connect=retries, read=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=(502, 503, 504) if retry_status else (),
+                  allowed_methods=frozenset(IDEMPOTENT_METHODS),
+                  respect_retry_after_header=retry_status,
+                  raise_on_status=False)
+    adapter = TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                               max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session